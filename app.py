@@ -1,79 +1,242 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import streamlit as st
 import pandas as pd
-from parser import parse_po, parse_oa
-from comparer import compare_oa_po
+import perf
+from parser import COLUMNS, is_complete, parse_po, parse_oa
+from comparer import PRICE_TOLERANCE, IncrementalComparer
+from ingest import PdfSource
+from parse_cache import ParseCache, content_key
+from results_store import ResultsStore
+from export import EXPORT_FORMATS, MIME, ExportCache, parquet_available
 
 st.set_page_config(page_title="OA vs PO Extractor", layout="wide")
 st.title("📄 OA vs PO PDF Extractor")
 
+
+# Shared across reruns and sessions; set OAPO_CACHE_DIR to also keep parses on disk
+@st.cache_resource
+def get_parse_cache():
+    return ParseCache(
+        disk_dir=os.environ.get("OAPO_CACHE_DIR") or None,
+        disk_max_bytes=int(os.environ.get("OAPO_CACHE_MB", "256")) * 1024 * 1024,
+    )
+
+
+parse_cache = get_parse_cache()
+
+
+# Set OAPO_RESULTS_DB to keep parses and comparison results in a SQLite file
+@st.cache_resource
+def get_results_store():
+    path = os.environ.get("OAPO_RESULTS_DB")
+    return ResultsStore(path) if path else None
+
+
+results_store = get_results_store()
+
+# ⏱ Optional per-stage timing for this rerun
+show_perf = st.sidebar.checkbox("⏱ Show performance breakdown")
+perf.stop()  # drop a recorder left behind by an interrupted rerun on this thread
+recorder = perf.start() if show_perf else None
+
+# 💲 Prices within this many dollars of each other count as matching
+price_tolerance = st.sidebar.number_input("💲 Price tolerance ($)", min_value=0.0, value=PRICE_TOLERANCE, step=0.01, format="%.2f")
+
+# Parses run on worker threads (the PDF extraction inside fans out to its own
+# processes), so the OA and PO are parsed side by side
+# 🧯 Those processes run under page / document timeouts and a memory cap (see
+# extract.py), so one pathological upload can't hang the app; OAPO_SANDBOX=0
+# extracts without them
+@st.cache_resource
+def get_parse_executor():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="oapo-parse")
+
+
+executor = get_parse_executor()
+
+
+# Downloads are built on request and shared by every session that asks for the same result
+@st.cache_resource
+def get_export_cache():
+    return ExportCache(max_bytes=int(os.environ.get("OAPO_EXPORT_CACHE_MB", "128")) * 1024 * 1024)
+
+
+export_cache = get_export_cache()
+PAGE_ROWS    = 1000  # larger tables are shown a page at a time
+
+
+def parse_job(kind, data, parse_fn, profile):
+    # runs on a worker thread: no st.* calls in here; timings are recorded on
+    # the worker's own recorder and merged back on the script thread
+    if results_store is not None:
+        # a document seen in an earlier session is loaded rather than parsed
+        parse_fn = lambda source, fn=parse_fn: results_store.get_or_parse(kind, source, fn)
+    if not profile:
+        return parse_cache.get_or_parse(kind, data, parse_fn), None
+    with perf.recording() as rec:
+        df = parse_cache.get_or_parse(kind, data, parse_fn)
+    return df, rec
+
+
+def show_table(df, key, rows=PAGE_ROWS):
+    # only the current page goes to the browser
+    if len(df) <= rows:
+        st.dataframe(df, use_container_width=True)
+        return
+    pages = -(-len(df) // rows)
+    page  = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"page:{key}:{len(df)}")
+    start = (page - 1) * rows
+    st.dataframe(df.iloc[start:start + rows], use_container_width=True)
+    st.caption(f"Rows {start + 1:,}–{min(start + rows, len(df)):,} of {len(df):,}")
+
+
+def show_export(df, key, label, file_stem):
+    # 📥 serialised only after "Prepare", then served from the export cache
+    formats = EXPORT_FORMATS if parquet_available() else ('csv',)
+    left, right = st.columns([1, 3])
+    fmt = left.selectbox("Format", formats, key=f"fmt:{key}", label_visibility="collapsed")
+    data = export_cache.peek(key, fmt)
+    if data is None and right.button(f"Prepare {label} {fmt.upper()}", key=f"prep:{key}"):
+        data = export_cache.get(df, fmt, key=key)
+    if data is not None:
+        right.download_button(
+            label=f"📥 Download {label} {fmt.upper()}",
+            data=data,
+            file_name=f"{file_stem}.{fmt}",
+            mime=MIME[fmt],
+            key=f"dl:{key}:{fmt}"
+        )
+
+
+def show_parsed(slot, label, df, key):
+    with slot.container():
+        st.subheader(f"Parsed {label} Data")
+        show_table(df[COLUMNS], key=label)
+        if df.attrs.get('order_total'):
+            st.caption(f"Order total (USD): {df.attrs['order_total']}")
+        if df.attrs.get('page_failures'):
+            st.warning(f"⚠️ {len(df.attrs['page_failures'])} page(s) could not be extracted; the data below is partial.")
+            st.dataframe(pd.DataFrame(df.attrs['page_failures'], columns=['Page', 'Reason']), hide_index=True)
+        if df.attrs.get('skipped_pages'):
+            st.caption(f"⏭ Skipped {df.attrs['skipped_pages']} page(s) after the footer or matching known boilerplate")
+        show_export(df[COLUMNS], key, label, f"{label.lower()}_extracted")
+
+
 col1, col2 = st.columns(2)
 
 # OA Upload
 with col1:
     st.header("📑 Order Acknowledgement (OA)")
     oa_file = st.file_uploader("Upload OA PDF", type=['pdf'], key='oa')
-    oa_df = None
-    if oa_file:
-        oa_df = parse_oa(oa_file)
-        st.subheader("Parsed OA Data")
-        st.dataframe(oa_df, use_container_width=True)
-        csv = oa_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download OA CSV",
-            data=csv,
-            file_name="oa_extracted.csv",
-            mime="text/csv"
-        )
+    oa_slot = st.empty()
 
 # PO Upload
 with col2:
     st.header("📑 Purchase Order (PO)")
     po_file = st.file_uploader("Upload PO PDF", type=['pdf'], key='po')
-    po_df = None
-    if po_file:
-        po_df = parse_po(po_file)
-        st.subheader("Parsed PO Data")
-        st.dataframe(po_df, use_container_width=True)
-        csv = po_df.to_csv(index=False).encode('utf-8')
-        st.download_button(
-            label="📥 Download PO CSV",
-            data=csv,
-            file_name="po_extracted.csv",
-            mime="text/csv"
-        )
+    po_slot = st.empty()
+
+# ⏳ Parse both uploads at once; each column fills in as soon as its parse is done
+jobs, doc_keys, sources = {}, {}, {}
+for label, file, parse_fn, slot in (('OA', oa_file, parse_oa, oa_slot),
+                                    ('PO', po_file, parse_po, po_slot)):
+    if file:
+        slot.info(f"⏳ Parsing {label}…")
+        # one view over the upload's buffer serves hashing and extraction
+        source = PdfSource.of(file)
+        fut    = executor.submit(parse_job, label.lower(), source, parse_fn, show_perf)
+        jobs[fut] = (label, slot)
+        doc_keys[label] = content_key(source, label.lower())
+        sources[label]  = source
+
+parsed = {}
+for fut in as_completed(jobs):
+    label, slot = jobs[fut]
+    try:
+        df, rec = fut.result()
+    except Exception as e:
+        slot.error(f"⚠️ Could not parse the {label}: {e}")
+        continue
+    if rec is not None and recorder is not None:
+        recorder.merge(rec)
+    parsed[label] = df
+    if not is_complete(df):
+        doc_keys[label] += '-partial'  # not the same result as a full parse of these bytes
+    show_parsed(slot, label, df, doc_keys[label])
+
+oa_df = parsed.get('OA')
+po_df = parsed.get('PO')
 
 # ✅ Comparison Section
 if po_file and oa_file and po_df is not None and oa_df is not None:
     st.markdown("---")
     st.header("✅ OA vs PO Comparison")
 
+    # the last comparison is kept per session, so it stays on screen while
+    # pages are flipped and exports prepared
+    cmp_key = (doc_keys['PO'], doc_keys['OA'], price_tolerance)
+    shown   = st.session_state.get('comparison')
+    if shown is not None and shown['key'] != cmp_key:
+        shown = st.session_state['comparison'] = None
+
     if st.button("🔍 Ready to Compare"):
         try:
-            disc_df, date_df = compare_oa_po(po_df, oa_df)
-
-            if disc_df.empty and date_df.empty:
-                st.success("I have reviewed the OA and Factory PO for this order and found no discrepancies. Everything else looked good.")
-            else:
-                st.warning("I have reviewed the OA and Factory PO for this order and found the following discrepancies. Everything else (that didn't appear in the list) looked good.")
-
-            # ✅ Date Discrepancies Table
-            if not date_df.empty:
-                st.subheader("📅 Date Discrepancies Found:")
-                st.dataframe(
-                    date_df[['Line', 'OA Expected Dates', 'PO Requested Dates']].sort_values(by='Line', key=lambda x: x.astype(int)),
-                    use_container_width=True
-                )
-
-            # Main Discrepancies
-            if not disc_df.empty:
-                st.subheader("📋 Main Discrepancies Found:")
-                st.dataframe(disc_df, use_container_width=True)
-                csv = disc_df.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 Download Discrepancy Report CSV",
-                    data=csv,
-                    file_name="oa_po_discrepancy_report.csv",
-                    mime="text/csv"
-                )
+            # 🔁 kept per session: when only one document was re-uploaded,
+            # only the lines that changed are compared again
+            comparer = st.session_state.setdefault('comparer', IncrementalComparer())
+            disc_df, date_df = comparer.compare(po_df, oa_df, price_tolerance,
+                                                po_key=doc_keys['PO'], oa_key=doc_keys['OA'])
+
+            if results_store is not None and is_complete(po_df) and is_complete(oa_df):
+                po_sha, oa_sha = sources['PO'].sha256(), sources['OA'].sha256()
+                results_store.save_document(po_sha, 'po', po_df)  # no-op when already stored
+                results_store.save_document(oa_sha, 'oa', oa_df)
+                results_store.save_reconciliation(po_sha, oa_sha, disc_df, date_df, price_tolerance)
+
+            shown = st.session_state['comparison'] = {
+                'key': cmp_key, 'disc_df': disc_df, 'date_df': date_df, 'rediffed': comparer.last_rediffed}
         except Exception as e:
             st.error(f"⚠️ An error occurred during comparison: {e}")
+
+    if shown is not None:
+        disc_df, date_df = shown['disc_df'], shown['date_df']
+        st.caption(f"🔁 Re-checked {shown['rediffed']} changed line(s)")
+
+        if disc_df.empty and date_df.empty:
+            st.success("I have reviewed the OA and Factory PO for this order and found no discrepancies. Everything else looked good.")
+        else:
+            st.warning("I have reviewed the OA and Factory PO for this order and found the following discrepancies. Everything else (that didn't appear in the list) looked good.")
+
+        # ✅ Date Discrepancies Table
+        if not date_df.empty:
+            st.subheader("📅 Date Discrepancies Found:")
+            show_table(
+                date_df[['Line', 'OA Expected Dates', 'PO Requested Dates']].sort_values(by='Line', key=lambda x: x.astype(int)),
+                key='dates'
+            )
+
+        # Main Discrepancies
+        if not disc_df.empty:
+            st.subheader("📋 Main Discrepancies Found:")
+            show_table(disc_df, key='discrepancies')
+            show_export(disc_df, "disc|" + "|".join(map(str, cmp_key)), "Discrepancy Report",
+                        "oa_po_discrepancy_report")
+
+# 📚 Earlier reconciliations of the same customer PO
+if results_store is not None and oa_df is not None and oa_df.attrs.get('cust_po'):
+    cust_po = oa_df.attrs['cust_po']
+    history = results_store.reconciliations(cust_po)
+    if not history.empty:
+        with st.expander(f"📚 Past reconciliations for PO {cust_po} ({len(history)})"):
+            show_table(history, key='history')
+
+# ⏱ Performance breakdown
+if recorder is not None:
+    perf.stop()
+    with st.expander("⏱ Performance", expanded=True):
+        if recorder.events:
+            st.caption(", ".join(f"{k}: {v}" for k, v in recorder.counters.items()))
+            st.dataframe(recorder.summary(), use_container_width=True)
+        else:
+            st.caption("Nothing was parsed or compared on this run (cached results were reused).")
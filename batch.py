@@ -0,0 +1,313 @@
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+import perf
+from extract import extract_text
+from ingest import PdfSource
+from parser import OPTIONAL_SECTIONS, PAGE_STOPS, is_complete, parse_oa_text, parse_po_text
+from comparer import PRICE_TOLERANCE, compare_oa_po, reconcile_many
+from results_store import ResultsStore
+
+# ── Batch reconciliation ──
+# python batch.py <folder|manifest.csv> --out <dir> [--workers N] [--format csv|parquet]
+#                 [--price-tolerance 0.01] [--profile spans.jsonl] [--store results.sqlite]
+#                 [--skip tags] [--skip calibration] [--sandbox | --no-sandbox]
+#
+# A folder is paired by file name: "<order>_OA.pdf" + "<order>_PO.pdf"
+# (separator may be _, -, . or space). A manifest is a CSV with columns
+# order, oa, po; relative paths resolve against the manifest's folder.
+# An order split over several documents ("<order>_OA_1.pdf", "<order>_OA_2.pdf",
+# or repeated manifest rows) is reconciled as one with comparer.reconcile_many.
+# With --store, parses and results are recorded in a ResultsStore; documents
+# (and pairs) already in it are loaded instead of extracted and re-compared.
+# --skip leaves an optional section out of parsing and comparison (a quick
+# price / date audit); such partial runs read the store but never write to it.
+# PO extraction stops at the document's footer, and pages listed in
+# OAPO_BOILERPLATE are dropped (see extract.py); the summary counts the
+# pages skipped.
+# Documents are extracted in a child process under the page / document
+# timeouts and memory cap from extract.py unless OAPO_SANDBOX=0 or
+# --no-sandbox; pages that fail are left out (and listed in the summary) and
+# the partial result is not stored.
+
+STAGES = ['extract', 'parse', 'compare']
+
+PAIR_NAME = re.compile(r'^(?P<order>.+?)[\s_.\-]*(?P<kind>OA|PO)(?:[\s_.\-]*(?P<part>\d+))?$', re.IGNORECASE)
+
+
+def pairs_from_dir(folder):
+    found = {}
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        m = PAIR_NAME.match(stem)
+        if ext.lower() != '.pdf' or not m:
+            continue
+        docs = found.setdefault(m.group('order'), {'oa': [], 'po': []})
+        docs[m.group('kind').lower()].append(os.path.join(folder, name))
+    return _grouped(found)
+
+
+def pairs_from_manifest(path):
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='', encoding='utf-8') as fh:
+        rows = list(csv.DictReader(fh))
+    found = {}
+    for r in rows:
+        docs = found.setdefault(r['order'], {'oa': [], 'po': []})
+        for kind in ('oa', 'po'):
+            p = os.path.join(base, r[kind])
+            if p not in docs[kind]:
+                docs[kind].append(p)
+    return _grouped(found)
+
+
+def _grouped(found):
+    # one (order, oa, po) per order; oa / po are a path, or a tuple of paths
+    # when the order is split over several documents
+    pairs, unpaired = [], []
+    for order, docs in found.items():
+        if docs['oa'] and docs['po']:
+            pairs.append((order, *(d[0] if len(d) == 1 else tuple(d) for d in (docs['oa'], docs['po']))))
+        else:
+            unpaired.append(order)
+    return pairs, unpaired
+
+
+def reconcile_pair(order, oa_path, po_path, profile=False, price_tolerance=PRICE_TOLERANCE, store=None, skip=(),
+                   sandbox=None):
+    timings = dict.fromkeys(STAGES, 0.0)
+    result  = {'order': order, 'oa': _joined(oa_path), 'po': _joined(po_path), 'timings': timings,
+               'error': '', 'disc_df': pd.DataFrame(), 'date_df': pd.DataFrame(),
+               'oa_lines': 0, 'po_lines': 0, 'oa_total': '', 'po_total': '',
+               'stored': 0, 'skipped_pages': 0, 'failed_pages': [], 'recorder': None,
+               'documents': sum(len(p) if isinstance(p, tuple) else 1 for p in (oa_path, po_path))}
+    if profile:
+        # recorders pickle cleanly, so they come back from pool workers too
+        with perf.recording() as rec:
+            _reconcile(result, oa_path, po_path, timings, price_tolerance, store, skip, sandbox)
+        result['recorder'] = rec
+    else:
+        _reconcile(result, oa_path, po_path, timings, price_tolerance, store, skip, sandbox)
+    return result
+
+
+def _load_or_parse(store, kind, source, parse_text, timings, skip=(), sandbox=None):
+    # a stored parse of the same bytes skips extraction and parsing both; a
+    # full parse serves a partial run too, but not the other way round
+    if store is not None:
+        df = store.load_document(source.sha256(), kind)
+        if df is not None:
+            return df, True
+    # extraction inside a worker stays serial; the batch pool is the parallelism
+    t = time.perf_counter()
+    stats = {}
+    with perf.span(f'{kind}.extract'):
+        text = extract_text(source, workers=1, stop=PAGE_STOPS[kind](), boilerplate=None, stats=stats, sandbox=sandbox)
+    timings['extract'] += time.perf_counter() - t
+
+    t = time.perf_counter()
+    df = parse_text(text, skip)
+    df.attrs['skipped_pages'] = stats['skipped_pages']
+    if stats.get('page_failures'):
+        df.attrs['page_failures'] = stats['page_failures']
+    timings['parse'] += time.perf_counter() - t
+    if store is not None and is_complete(df):
+        store.save_document(source.sha256(), kind, df)
+    return df, False
+
+
+def _joined(paths):
+    return '; '.join(paths) if isinstance(paths, tuple) else paths
+
+
+def _failed_pages(kind, label, df):
+    return [f"{label or kind.upper()} p{page}: {reason}" for page, reason in df.attrs.get('page_failures', ())]
+
+
+def _reconcile(result, oa_path, po_path, timings, price_tolerance, store_path=None, skip=(), sandbox=None):
+    store = None
+    try:
+        store = ResultsStore(store_path) if store_path else None
+        if isinstance(oa_path, tuple) or isinstance(po_path, tuple):
+            _reconcile_split(result, oa_path, po_path, timings, price_tolerance, store, skip, sandbox)
+            return
+        with PdfSource.of(oa_path) as oa_src, PdfSource.of(po_path) as po_src:
+            oa_df, oa_stored = _load_or_parse(store, 'oa', oa_src, parse_oa_text, timings, skip, sandbox)
+            po_df, po_stored = _load_or_parse(store, 'po', po_src, parse_po_text, timings, skip, sandbox)
+            oa_sha, po_sha   = oa_src.sha256(), po_src.sha256()
+        result['stored'] = oa_stored + po_stored
+        result['oa_lines'], result['po_lines'] = len(oa_df), len(po_df)
+        result['oa_total'] = oa_df.attrs.get('order_total', '')
+        result['po_total'] = po_df.attrs.get('order_total', '')
+        result['skipped_pages'] = oa_df.attrs.get('skipped_pages', 0) + po_df.attrs.get('skipped_pages', 0)
+        result['failed_pages']  = _failed_pages('oa', '', oa_df) + _failed_pages('po', '', po_df)
+        complete = is_complete(oa_df) and is_complete(po_df)
+
+        t = time.perf_counter()
+        # stored reconciliations are full ones, so partial runs always compare
+        found = store.load_reconciliation(po_sha, oa_sha, price_tolerance) if store and complete and not skip else None
+        if found is None:
+            found = compare_oa_po(po_df, oa_df, price_tolerance, skip)
+            if store is not None and complete and not skip:
+                store.save_reconciliation(po_sha, oa_sha, *found, price_tolerance)
+        result['disc_df'], result['date_df'] = found
+        timings['compare'] = time.perf_counter() - t
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+    finally:
+        if store is not None:
+            store.close()
+
+
+def _reconcile_split(result, oa_paths, po_paths, timings, price_tolerance, store, skip=(), sandbox=None):
+    # an order spread over several OAs and/or POs; documents still come from
+    # the store when it has them, but the combined result is not stored
+    docs = {}
+    for kind, paths, parse_text in (('oa', oa_paths, parse_oa_text), ('po', po_paths, parse_po_text)):
+        paths = paths if isinstance(paths, tuple) else (paths,)
+        names = [os.path.basename(p) for p in paths]
+        labels = names if len(set(names)) == len(names) else list(paths)
+        docs[kind] = {}
+        for label, path in zip(labels, paths):
+            with PdfSource.of(path) as src:
+                df, stored = _load_or_parse(store, kind, src, parse_text, timings, skip, sandbox)
+            docs[kind][label] = df
+            result['stored'] += stored
+            result['skipped_pages'] += df.attrs.get('skipped_pages', 0)
+            result['failed_pages']  += _failed_pages(kind, label, df)
+        result[f'{kind}_lines'] = sum(len(df) for df in docs[kind].values())
+        result[f'{kind}_total'] = '; '.join(df.attrs.get('order_total', '') for df in docs[kind].values())
+
+    t = time.perf_counter()
+    result['disc_df'], result['date_df'], _ = reconcile_many(docs['po'], docs['oa'], price_tolerance, skip)
+    timings['compare'] = time.perf_counter() - t
+
+
+def _consolidate(results):
+    frames = []
+    for r in results:
+        if not r['disc_df'].empty:
+            frames.append(r['disc_df'].assign(Order=r['order'], Kind='line'))
+        if not r['date_df'].empty:
+            frames.append(r['date_df'].assign(Order=r['order'], Kind='date'))
+    if not frames:
+        return pd.DataFrame(columns=['Order', 'Kind', 'Discrepancy'])
+    df = pd.concat(frames, ignore_index=True)
+    first = ['Order', 'Kind']
+    return df[first + [c for c in df.columns if c not in first]]
+
+
+def _summary(results):
+    return pd.DataFrame([{
+        'Order':            r['order'],
+        'Status':           'error' if r['error'] else ('clean' if r['disc_df'].empty and r['date_df'].empty else 'discrepancies'),
+        'OA Rows':          r['oa_lines'],
+        'PO Rows':          r['po_lines'],
+        'OA Total':         r['oa_total'],
+        'PO Total':         r['po_total'],
+        'Skipped Pages':    r['skipped_pages'],
+        'Failed Pages':     '; '.join(r['failed_pages']),
+        'Discrepancies':    len(r['disc_df']),
+        'Date Mismatches':  len(r['date_df']),
+        'Error':            r['error'],
+        'OA File':          r['oa'],
+        'PO File':          r['po'],
+    } for r in results])
+
+
+def _write(df, path_no_ext, fmt):
+    if fmt == 'parquet':
+        df.to_parquet(path_no_ext + '.parquet', index=False)
+    else:
+        df.to_csv(path_no_ext + '.csv', index=False)
+
+
+def run(pairs, out_dir, workers, fmt, profile=None, price_tolerance=PRICE_TOLERANCE, store=None, skip=(),
+        sandbox=None):
+    os.makedirs(os.path.join(out_dir, 'orders'), exist_ok=True)
+    if store:
+        ResultsStore(store).close()  # create the schema before workers race to
+
+    wall = time.perf_counter()
+    job = partial(reconcile_pair, profile=bool(profile), price_tolerance=price_tolerance, store=store, skip=skip,
+                  sandbox=sandbox)
+    if workers > 1 and len(pairs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(job, *zip(*pairs)))
+    else:
+        results = [job(*p) for p in pairs]
+    wall = time.perf_counter() - wall
+
+    if profile:
+        for r in results:
+            if r['recorder'] is not None:
+                r['recorder'].to_jsonl(profile, order=r['order'])
+
+    _write(_consolidate(results), os.path.join(out_dir, 'discrepancies'), fmt)
+    _write(_summary(results), os.path.join(out_dir, 'summary'), fmt)
+    for r in results:
+        per_order = _consolidate([r])
+        safe = re.sub(r'[^\w.\-]+', '_', r['order'])
+        _write(per_order, os.path.join(out_dir, 'orders', safe), fmt)
+
+    # every document (an OA and a PO, or more for split orders) goes through every stage
+    n_docs = sum(r['documents'] for r in results)
+    print(f"{len(results)} orders, {n_docs} documents, {workers} worker(s), {wall:.2f}s wall")
+    if store:
+        print(f"{sum(r['stored'] for r in results)} document(s) loaded from {store}")
+    print(f"{'stage':<10}{'busy s':>10}{'docs/sec':>12}")
+    for stage in STAGES:
+        busy = sum(r['timings'][stage] for r in results)
+        print(f"{stage:<10}{busy:>10.2f}{(n_docs / busy if busy else float('inf')):>12.1f}")
+    print(f"{'overall':<10}{wall:>10.2f}{(n_docs / wall if wall else float('inf')):>12.1f}")
+    errors = [r for r in results if r['error']]
+    for r in errors:
+        print(f"  ! {r['order']}: {r['error']}", file=sys.stderr)
+    return 1 if errors else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Reconcile folders of OA/PO PDF pairs")
+    ap.add_argument('source', help="folder of <order>_OA.pdf / <order>_PO.pdf files, or a manifest CSV (order,oa,po)")
+    ap.add_argument('--out', default='reconciliation', help="output folder")
+    ap.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    ap.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    ap.add_argument('--price-tolerance', type=float, default=PRICE_TOLERANCE, metavar='DOLLARS',
+                    help="treat prices within this many dollars as matching")
+    ap.add_argument('--profile', metavar='FILE', help="append per-stage timing spans for every order to FILE (JSON lines)")
+    ap.add_argument('--store', metavar='DB', help="record parses and results in this SQLite file and reuse what it already holds")
+    ap.add_argument('--skip', action='append', default=[], choices=OPTIONAL_SECTIONS, metavar='SECTION',
+                    help=f"leave a section out of parsing and comparison; repeatable ({', '.join(OPTIONAL_SECTIONS)})")
+    ap.add_argument('--sandbox', action=argparse.BooleanOptionalAction, default=None,
+                    help="extract each PDF in a child process with timeouts and a memory cap (OAPO_PAGE_TIMEOUT, "
+                         "OAPO_DOC_TIMEOUT, OAPO_EXTRACT_MEMORY_MB); default from OAPO_SANDBOX, on unless 0")
+    args = ap.parse_args(argv)
+
+    if args.format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit("Parquet output needs pyarrow (pip install pyarrow), or use --format csv")
+
+    if os.path.isdir(args.source):
+        pairs, unpaired = pairs_from_dir(args.source)
+    else:
+        pairs, unpaired = pairs_from_manifest(args.source)
+    for order in unpaired:
+        print(f"  skipping {order}: needs both an OA and a PO", file=sys.stderr)
+    if not pairs:
+        sys.exit("No OA/PO pairs found.")
+    return run(pairs, args.out, args.workers, args.format, args.profile, args.price_tolerance, args.store,
+               tuple(args.skip), args.sandbox)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
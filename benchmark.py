@@ -0,0 +1,353 @@
+import argparse
+import gc
+import hashlib
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import time
+import tracemalloc
+import types
+
+import pandas as pd
+
+import comparer
+import parser as oapo_parser
+from extract import extract_text
+from synthetic import make_order, make_oa_text, make_po_text, perturb_order, text_to_pdf
+
+# ── Literal-pattern mode ──
+# Stand-in for the pre-registry parser: every call goes back through
+# re.<fn>(pattern, ...) and therefore through the re module's cache.
+
+class _LiteralPattern:
+    def __init__(self, compiled):
+        self.pattern = compiled.pattern
+        self.flags   = compiled.flags
+
+    # re.compile goes through the re module's cache on every call, like the
+    # module-level functions, but takes the compiled-pattern pos / endpos
+    def _compiled(self):
+        return re.compile(self.pattern, self.flags)
+
+    def search(self, s, pos=0, endpos=sys.maxsize):
+        return self._compiled().search(s, pos, endpos)
+
+    def match(self, s, pos=0, endpos=sys.maxsize):
+        return self._compiled().match(s, pos, endpos)
+
+    def fullmatch(self, s, pos=0, endpos=sys.maxsize):
+        return self._compiled().fullmatch(s, pos, endpos)
+
+    def findall(self, s, pos=0, endpos=sys.maxsize):
+        return self._compiled().findall(s, pos, endpos)
+
+    def finditer(self, s, pos=0, endpos=sys.maxsize):
+        return self._compiled().finditer(s, pos, endpos)
+
+    def split(self, s):
+        return re.split(self.pattern, s, flags=self.flags)
+
+    def sub(self, repl, s):
+        return re.sub(self.pattern, repl, s, flags=self.flags)
+
+
+def _set_patterns(mode):
+    for name, pat in oapo_parser.PATTERNS.items():
+        setattr(oapo_parser, name, _LiteralPattern(pat) if mode == 'literal' else pat)
+
+
+def _best_of(parse_fn, text, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        df = parse_fn(text)
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(df)
+
+
+def bench_regex(sizes, repeat):
+    print(f"{'doc':<4}{'lines':>7}{'mode':>10}{'total ms':>11}{'µs/block':>11}")
+    for n in sizes:
+        order = make_order(n)
+        docs = [('PO', oapo_parser.parse_po_text, make_po_text(order)),
+                ('OA', oapo_parser.parse_oa_text, make_oa_text(order))]
+        for label, fn, text in docs:
+            for mode in ('literal', 'compiled'):
+                _set_patterns(mode)
+                ns, rows = _best_of(fn, text, repeat)
+                print(f"{label:<4}{n:>7}{mode:>10}{ns / 1e6:>11.2f}{ns / 1e3 / max(rows, 1):>11.1f}")
+    _set_patterns('compiled')
+
+
+def load_module_at(rev, name):
+    # the module source as of a git revision, for before/after comparisons
+    here = os.path.dirname(os.path.abspath(__file__))
+    src  = subprocess.run(['git', 'show', f'{rev}:{name}.py'], cwd=here,
+                          capture_output=True, text=True, check=True).stdout
+    mod  = types.ModuleType(f'{name}@{rev}')
+    exec(compile(src, f'{rev}:{name}.py', 'exec'), mod.__dict__)
+    return mod
+
+
+def bench_compare(sizes, repeat, against):
+    impls = [('current', comparer)]
+    if against:
+        impls.insert(0, (against, load_module_at(against, 'comparer')))
+    print(f"{'lines':>7}{'impl':>12}{'ms':>11}{'rows':>7}")
+    for n in sizes:
+        order = make_order(n)
+        po_df = oapo_parser.parse_po_text(make_po_text(order))
+        oa_df = oapo_parser.parse_oa_text(make_oa_text(perturb_order(order)))
+        outputs = []
+        for label, mod in impls:
+            best = None
+            for _ in range(repeat):
+                po, oa = po_df.copy(), oa_df.copy()
+                start  = time.perf_counter_ns()
+                disc_df, date_df = mod.compare_oa_po(po, oa)
+                elapsed = time.perf_counter_ns() - start
+                best = elapsed if best is None else min(best, elapsed)
+            outputs.append((disc_df, date_df))
+            print(f"{n:>7}{label:>12}{best / 1e6:>11.1f}{len(disc_df):>7}")
+        if len(outputs) == 2:
+            same = all(a.reset_index(drop=True).equals(b.reset_index(drop=True))
+                       for a, b in zip(*outputs))
+            print(f"{'':>7}{'identical':>12}{str(same):>11}")
+
+
+# ── Stage suite ──
+# Times extraction, parsing and comparison on synthetic orders of each size
+# (best of --repeat runs), measures peak traced memory in a separate run, and
+# fingerprints every stage's output. --save writes the numbers to JSON;
+# --baseline reads such a file back and flags stages that got slower than
+# --tolerance or whose output changed.
+
+def _digest(*frames):
+    h = hashlib.sha1()
+    for df in frames:
+        if oapo_parser.TAG_SET_COLUMN in df.columns:
+            df = df[oapo_parser.COLUMNS]  # frozenset order varies with PYTHONHASHSEED
+        h.update(df.to_csv(index=False).encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+def _measure(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        start  = time.perf_counter_ns()
+        out    = fn()
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    # tracemalloc slows everything down, so memory gets its own run
+    tracemalloc.start()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return out, best / 1e6, peak / 2**20
+
+
+def _suite_stages(n, pdf_max_lines, workers, parse_workers=None, sandbox=False):
+    order = make_order(n)
+    po_text, oa_text = make_po_text(order), make_oa_text(perturb_order(order))
+    stages = []
+    if n <= pdf_max_lines:
+        po_pdf, oa_pdf = text_to_pdf(po_text), text_to_pdf(oa_text)
+        # inline unless asked: sandboxed timings include forking the children,
+        # and their allocations don't show in this process's peak
+        stages += [('extract.po', lambda: extract_text(po_pdf, workers, sandbox=sandbox)),
+                   ('extract.oa', lambda: extract_text(oa_pdf, workers, sandbox=sandbox))]
+    po_df = oapo_parser.parse_po_text(po_text)
+    oa_df = oapo_parser.parse_oa_text(oa_text)
+    stages += [('parse.po', lambda: oapo_parser.parse_po_text(po_text, block_workers=parse_workers)),
+               ('parse.oa', lambda: oapo_parser.parse_oa_text(oa_text, block_workers=parse_workers)),
+               ('compare',  lambda: comparer.compare_oa_po(po_df.copy(), oa_df.copy()))]
+    return stages
+
+
+def bench_suite(sizes, repeat, pdf_max_lines, workers, save, baseline, tolerance, parse_workers=None, sandbox=False):
+    base = {}
+    if baseline:
+        with open(baseline, encoding='utf-8') as fh:
+            base = json.load(fh)['results']
+
+    results = {}
+    regressions = 0
+    print(f"{'stage':<12}{'lines':>7}{'ms':>11}{'base ms':>11}{'change':>9}{'peak MB':>10}{'output':>10}")
+    for n in sizes:
+        for stage, fn in _suite_stages(n, pdf_max_lines, workers, parse_workers, sandbox):
+            out, ms, peak = _measure(fn, repeat)
+            if isinstance(out, str):
+                digest = hashlib.sha1(out.encode('utf-8')).hexdigest()[:12]
+            else:
+                digest = _digest(*(out if isinstance(out, tuple) else (out,)))
+            key = f"{stage}/{n}"
+            results[key] = {'ms': round(ms, 3), 'peak_mb': round(peak, 2), 'digest': digest}
+
+            ref = base.get(key)
+            if ref is None:
+                print(f"{stage:<12}{n:>7}{ms:>11.1f}{'-':>11}{'':>9}{peak:>10.1f}{'':>10}")
+                continue
+            change = ms / ref['ms'] - 1 if ref['ms'] else 0.0
+            same   = ref['digest'] == digest
+            flag   = '  SLOWER' if change > tolerance else ''
+            regressions += bool(flag) + (not same)
+            print(f"{stage:<12}{n:>7}{ms:>11.1f}{ref['ms']:>11.1f}{change:>+9.0%}{peak:>10.1f}"
+                  f"{('same' if same else 'CHANGED'):>10}{flag}")
+
+    if save:
+        meta = {'python': platform.python_version(), 'pandas': pd.__version__,
+                'machine': platform.machine(), 'cpus': os.cpu_count(), 'repeat': repeat,
+                'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+        with open(save, 'w', encoding='utf-8') as fh:
+            json.dump({'meta': meta, 'results': results}, fh, indent=2)
+        print(f"saved {len(results)} results to {save}")
+    return 1 if regressions else 0
+
+
+# ── Backtracking guard ──
+# Feeds every pattern in parser.PATTERNS long single-line inputs built to
+# almost match it: its own literals repeated, digit / comma / space / hyphen
+# runs (bare and behind the pattern's leading literals) and seeded OCR-style
+# noise. Each input is scanned the way the parser applies the pattern (line
+# lookups, anchored matches, the slash-tag scanner; a full finditer
+# otherwise). A scan slower than --budget ms at the largest size, or one
+# growing more than --max-growth times when the input quadruples, fails the
+# run (exit 1).
+
+NOISE = "AZaz09-_,./:#$()%° \t"
+
+
+def _line_lookup(needle, how='_line_search', **kw):
+    return lambda pat, text: getattr(oapo_parser, how)(pat, text, oapo_parser._lowered(text), needle, **kw)
+
+
+# how the parser applies patterns it doesn't simply search block by block
+# (a full finditer bounds those)
+PATTERN_APPLY = {
+    'RE_PO_ORDER_TOTAL':  _line_lookup('order total', anchored=True),
+    'RE_PO_GST':          _line_lookup('spartan', anchored=True),
+    'RE_OA_ORDER_TOTAL':  _line_lookup('total', anchored=True),
+    'RE_OA_TARIFF':       lambda pat, text: list(oapo_parser._line_matches(pat, text, oapo_parser._lowered(text), 'tariff')),
+    'RE_OA_CUST_PO':      _line_lookup('customer po', '_last_group'),
+    'RE_SLASH_TAG':       lambda pat, text: oapo_parser._slash_tags(text),
+    'RE_OA_MODEL':        lambda pat, text: oapo_parser._oa_model(text),
+    'RE_OA_TAG_LABEL':    lambda pat, text: pat.match(text),
+    'RE_OA_COMPOUND_TAG': lambda pat, text: pat.fullmatch(text),
+    'RE_TAG_RUN_BACK':    lambda pat, text: pat.match(text),
+    'RE_WORD_EDGE':       lambda pat, text: pat.search(text),
+}
+
+
+def _adversarial(pattern, n):
+    # (input name, text of about n characters)
+    # literal words only: escapes and character classes dropped first
+    words = re.findall(r'[A-Za-z#]{2,}', re.sub(r'\\.|\[[^\]]*\]', ' ', pattern.pattern))
+    leads = sorted({' '.join(words[:k]) + ' ' for k in (1, 2) if words})
+    units = {'literals': ' '.join(words) + ' ' if words else 'x ', 'literals-digits': ' '.join(words) + ' 1,1 ',
+             'digits': '1', 'commas': '1,', 'spaces': ' ', 'numbers': '1 ', 'decimals': '1.', 'hyphens': 'A1-',
+             'bare-hyphens': '1-', 'caps': 'AB1', 'to': '1 to '}
+    for name, unit in units.items():
+        body = (unit * (n // len(unit) + 1))[:n]
+        yield name, body + '~'
+        for lead in leads:
+            yield f'{name} (after {lead.strip()!r})', lead + body + '~'
+    rng = random.Random(n)
+    yield 'noise', ''.join(rng.choice(NOISE) for _ in range(n))
+
+
+def bench_backtrack(sizes, budget_ms, max_growth, only=None):
+    sizes  = sorted(sizes)
+    failed = 0
+    print(f"{'pattern':<20}{'worst input':<42}" + ''.join(f"{n:>10}" for n in sizes) + f"{'growth':>9}")
+    for name, pat in oapo_parser.PATTERNS.items():
+        if only and name not in only:
+            continue
+        apply = PATTERN_APPLY.get(name, lambda p, text: list(p.finditer(text)))
+        worst = {}
+        for n in sizes:
+            for label, text in _adversarial(pat, n):
+                # as in timeit: best of a few runs, with no collection set off
+                # by thousands of match objects counted against the pattern
+                gc.disable()
+                try:
+                    ms = float('inf')
+                    for _ in range(3):
+                        start = time.perf_counter()
+                        apply(pat, text)
+                        ms = min(ms, (time.perf_counter() - start) * 1e3)
+                finally:
+                    gc.enable()
+                worst.setdefault(label, {})[n] = ms
+        label, times = max(worst.items(), key=lambda kv: kv[1][sizes[-1]])
+        top = times[sizes[-1]]
+        # growth per 4x input across the whole size range (steadier than
+        # neighbouring sizes), once times are big enough to measure
+        lo, hi = sizes[0], sizes[-1]
+        growth = ((top / max(times[lo], 1e-3)) ** (math.log(4) / math.log(hi / lo))
+                  if hi > lo and top > 1.0 else 0.0)
+        bad = top > budget_ms or growth > max_growth
+        failed += bad
+        print(f"{name:<20}{label[:41]:<42}" + ''.join(f"{times[n]:>10.2f}" for n in sizes)
+              + f"{growth:>9.1f}" + ('  FAIL' if bad else ''))
+    print(f"{failed} pattern(s) over budget" if failed else "all patterns within budget")
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="OA/PO parser micro-benchmarks")
+    sub = ap.add_subparsers(dest='cmd', required=True)
+
+    p = sub.add_parser('regex', help="per-block parse time, literal re.* calls vs compiled registry")
+    p.add_argument('--lines', type=int, nargs='+', default=[100, 400, 800])
+    p.add_argument('--repeat', type=int, default=5)
+
+    p = sub.add_parser('compare', help="compare_oa_po wall time, optionally against another git revision")
+    p.add_argument('--lines', type=int, nargs='+', default=[1000, 10000])
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--against', metavar='REV', help="also time comparer.py from this git revision")
+
+    p = sub.add_parser('suite', help="extract / parse / compare timings and peak memory, against a stored baseline")
+    p.add_argument('--lines', type=int, nargs='+', default=[10, 100, 1000, 10000, 50000])
+    p.add_argument('--repeat', type=int, default=3)
+    p.add_argument('--pdf-max-lines', type=int, default=1000,
+                   help="render PDFs and time extraction only up to this many lines (0 to skip extraction)")
+    p.add_argument('--workers', type=int, default=1, help="extraction worker processes")
+    p.add_argument('--parse-workers', type=int, default=None,
+                   help="block-parsing worker processes (default: $OAPO_PARSE_WORKERS, else serial)")
+    p.add_argument('--sandbox', action='store_true',
+                   help="time extraction in the sandbox's child processes (off by default, whatever OAPO_SANDBOX says)")
+    p.add_argument('--save', metavar='FILE', help="write results to FILE (JSON) for use as a baseline")
+    p.add_argument('--baseline', metavar='FILE', help="compare against results saved with --save")
+    p.add_argument('--tolerance', type=float, default=0.25,
+                   help="flag stages more than this fraction slower than the baseline")
+
+    p = sub.add_parser('backtrack', help="time every parser pattern on adversarial long lines; exit 1 over budget")
+    p.add_argument('--sizes', type=int, nargs='+', default=[2000, 8000, 32000], help="input lengths (characters)")
+    p.add_argument('--budget', type=float, default=50.0, help="ms allowed per scan at the largest size")
+    p.add_argument('--max-growth', type=float, default=8.0,
+                   help="largest allowed slowdown when the input quadruples (4 is linear, 16 quadratic)")
+    p.add_argument('--pattern', action='append', metavar='NAME', help="only this RE_ name; repeatable")
+
+    args = ap.parse_args(argv)
+    if args.cmd == 'regex':
+        bench_regex(args.lines, args.repeat)
+    elif args.cmd == 'compare':
+        bench_compare(args.lines, args.repeat, args.against)
+    elif args.cmd == 'suite':
+        return bench_suite(args.lines, args.repeat, args.pdf_max_lines, args.workers,
+                           args.save, args.baseline, args.tolerance, args.parse_workers, args.sandbox)
+    elif args.cmd == 'backtrack':
+        return bench_backtrack(args.sizes, args.budget, args.max_growth, args.pattern)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
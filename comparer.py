@@ -1,8 +1,13 @@
+import hashlib
+import numpy as np
 import pandas as pd
 import re
 from difflib import ndiff
+from functools import lru_cache
 from dateutil.parser import parse as date_parse
 
+import perf
+
 def normalize_line_number(ln):
     try:
         return str(int(str(ln).strip()))
@@ -21,21 +26,154 @@ def parse_price(p):
     except:
         return None
 
+# prices within this many dollars of each other count as equal
+PRICE_TOLERANCE = 0.0
+
+# (printed column, integer-cents column) as emitted by the parsers
+PRICE_CENTS = [('Unit Price', 'Unit Cents'), ('Total Price', 'Total Cents')]
+
+def with_price_cents(df):
+    # frames from the parsers already carry cents; anything else is parsed
+    # here once, vectorized
+    missing = {cents: (pd.to_numeric(df[col].astype(str).str.replace(',', '', regex=False).str.strip(),
+                                     errors='coerce') * 100).round().astype('Int64')
+               for col, cents in PRICE_CENTS if cents not in df}
+    return df.assign(**missing) if missing else df
+
+def with_tag_sets(df):
+    # the parsers emit 'Tag Set'; for other frames derive it from Tags once
+    # per distinct string
+    if 'Tag Set' in df:
+        return df
+    sets = {v: frozenset(v.split(', ')) if v else frozenset() for v in df['Tags'].unique()}
+    return df.assign(**{'Tag Set': df['Tags'].map(sets)})
+
+def order_total(df):
+    # (printed, cents) order total from the frame's metadata
+    return df.attrs.get('order_total', ''), order_total_cents(df)
+
+def order_total_cents(df):
+    cents = df.attrs.get('order_total_cents')
+    if cents is None:
+        p = parse_price(df.attrs.get('order_total', ''))
+        cents = None if p is None else round(p * 100)
+    return cents
+
+def _cents_array(s):
+    return s.to_numpy(dtype='float64', na_value=np.nan)
+
+# combine_duplicate_lines column handling: (column, separator) for plain
+# values, Y/N flags, and comma-separated list columns merged item by item
+COMBINE_JOIN  = [('Model Number', ' / '), ('Ship Date', ', '), ('Qty', ', '),
+                 ('Unit Price', ', '), ('Total Price', ', ')]
+COMBINE_FLAGS = ['Has Tag?', 'Calib Data?']
+COMBINE_LISTS = ['Tags', 'Wire-on Tag', 'Calib Details']
+COMBINE_COLS  = ['Model Number', 'Ship Date', 'Qty', 'Unit Price', 'Total Price',
+                 'Has Tag?', 'Tags', 'Wire-on Tag', 'Calib Data?', 'Calib Details']
+# cents survive a merge only when every row of the line agrees; tag sets
+# are unioned
+COMBINE_CENTS = ['Unit Cents', 'Total Cents']
+COMBINE_SETS  = ['Tag Set']
+
+def _sorted_items(s):
+    return ', '.join(sorted(set(s.split(', '))))
+
+def _join_groups(df, col, sep):
+    # sorted distinct values per Line No, joined; groups come out in key order
+    uniq = df[['Line No', col]].drop_duplicates().sort_values(['Line No', col])
+    return uniq.groupby('Line No', sort=True)[col].agg(sep.join)
+
 def combine_duplicate_lines(df):
-    df = df.copy()
-    df['Line No'] = df['Line No'].astype(str).apply(normalize_line_number)
-    return df.groupby('Line No').agg({
-        'Model Number': lambda x: ' / '.join(sorted(set(x))),
-        'Ship Date': lambda x: ', '.join(sorted(set(x))),
-        'Qty': lambda x: ', '.join(sorted(set(x))),
-        'Unit Price': lambda x: ', '.join(sorted(set(x))),
-        'Total Price': lambda x: ', '.join(sorted(set(x))),
-        'Has Tag?': lambda x: 'Y' if 'Y' in x.values else 'N',
-        'Tags': lambda x: ', '.join(sorted(set(', '.join(x).split(', ')))),
-        'Wire-on Tag': lambda x: ', '.join(sorted(set(', '.join(x).split(', ')))),
-        'Calib Data?': lambda x: 'Y' if 'Y' in x.values else 'N',
-        'Calib Details': lambda x: ', '.join(sorted(set(', '.join(x).split(', '))))
-    }).reset_index()
+    cents   = [col for col in COMBINE_CENTS if col in df]
+    sets    = [col for col in COMBINE_SETS if col in df]
+    carried = cents + sets
+    if df.empty:
+        return df[['Line No'] + COMBINE_COLS + carried].astype({'Line No': str}).reset_index(drop=True)
+
+    raw = df['Line No'].astype(str)
+    key = raw.map({v: normalize_line_number(v) for v in raw.unique()})
+    dup = key.duplicated(keep=False).to_numpy()
+
+    # fast path: a line that appears once keeps its values; only flags are
+    # normalized to Y/N and list columns sorted/deduplicated
+    parts = []
+    one = df.loc[~dup]
+    if not one.empty:
+        singles = {'Line No': key[~dup]}
+        for col, _ in COMBINE_JOIN:
+            singles[col] = one[col]
+        for col in COMBINE_FLAGS:
+            singles[col] = (one[col] == 'Y').map({True: 'Y', False: 'N'})
+        for col in COMBINE_LISTS:
+            singles[col] = one[col].map({v: _sorted_items(v) for v in one[col].unique()})
+        for col in carried:
+            singles[col] = one[col]
+        parts.append(pd.DataFrame(singles))
+
+    many = df.loc[dup, COMBINE_COLS + carried].assign(**{'Line No': key[dup]})
+    if not many.empty:
+        merged = {col: _join_groups(many, col, sep) for col, sep in COMBINE_JOIN}
+        for col in COMBINE_FLAGS:
+            merged[col] = (many[col] == 'Y').groupby(many['Line No']).any().map({True: 'Y', False: 'N'})
+        for col in COMBINE_LISTS:
+            items = many[['Line No', col]].assign(**{col: many[col].str.split(', ')}).explode(col)
+            merged[col] = _join_groups(items, col, ', ')
+        for col in cents:
+            grp = many.groupby('Line No', sort=True)[col]
+            merged[col] = grp.first().where(grp.nunique(dropna=False) == 1)
+        for col in sets:
+            merged[col] = many.groupby('Line No', sort=True)[col].agg(lambda s: frozenset().union(*s))
+        parts.append(pd.DataFrame(merged).rename_axis('Line No').reset_index())
+
+    out = pd.concat(parts, ignore_index=True)[['Line No'] + COMBINE_COLS + carried]
+    return out.sort_values('Line No', ignore_index=True)
+
+# the two layouts the parsers emit: OA "Expected Ship Date" and PO ship date
+SHIP_DATE_FORMATS = ['%d-%b-%Y', '%b %d, %Y']
+
+@lru_cache(maxsize=4096)
+def _parse_date_fallback(s):
+    try:
+        return date_parse(s, dayfirst=True).date()
+    except:
+        return None
+
+def parse_ship_dates(values):
+    # Ship Date strings -> datetime.date (None when unparseable). Each distinct
+    # string is parsed once: the known formats vectorized, leftovers via dateutil.
+    uniq = list(pd.unique(values))
+    keys = pd.Series([str(v) for v in uniq], dtype=object)
+    parsed = pd.Series(pd.NaT, index=keys.index, dtype='datetime64[s]')
+    for fmt in SHIP_DATE_FORMATS:
+        todo = parsed.isna()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(keys[todo], format=fmt, errors='coerce')
+    memo = {
+        v: (ts.date() if not pd.isna(ts) else _parse_date_fallback(k))
+        for v, k, ts in zip(uniq, keys, parsed)
+    }
+    return pd.Series([memo[v] for v in values], index=values.index, dtype=object)
+
+def describe_date_gaps(oa_dates, po_dates):
+    def as_days(dates):
+        return np.array([np.datetime64(d, 'D') if d is not None else np.datetime64('NaT')
+                         for d in dates], dtype='datetime64[D]')
+
+    gap     = as_days(po_dates) - as_days(oa_dates)
+    unknown = np.isnat(gap)
+    days    = np.abs(np.where(unknown, np.timedelta64(0, 'D'), gap).astype(np.int64))
+    out = np.select(
+        [unknown, days < 7, days < 14, days < 30, days < 60, days < 365],
+        ["Unknown", "<1 week", "1–2 weeks",
+         np.char.add((days // 7).astype(str), " weeks"),
+         "1–2 months",
+         np.char.add((days // 30).astype(str), " months")],
+        default=np.char.add(np.round(days / 365, 1).astype(str), " years"),
+    )
+    return pd.Series(out.tolist(), index=oa_dates.index)
+
+DATE_COLUMNS = ['Line', 'OA Expected Dates', 'PO Requested Dates', 'Date Difference']
 
 def compare_dates(oa_df, po_df):
     oa = oa_df[['Line No', 'Ship Date']].copy()
@@ -43,47 +181,21 @@ def compare_dates(oa_df, po_df):
     oa['Line No'] = oa['Line No'].apply(normalize_line_number)
     po['Line No'] = po['Line No'].apply(normalize_line_number)
 
-    def try_parse(x):
-        try:
-            return date_parse(str(x), dayfirst=True).date()
-        except:
-            return None
-
-    oa['__parsed'] = oa['Ship Date'].apply(try_parse)
-    po['__parsed'] = po['Ship Date'].apply(try_parse)
+    oa['__parsed'] = parse_ship_dates(oa['Ship Date'])
+    po['__parsed'] = parse_ship_dates(po['Ship Date'])
 
     merged = pd.merge(oa, po, on='Line No', suffixes=('_OA', '_PO'))
-    diff = merged[merged['__parsed_OA'] != merged['__parsed_PO']]
+    diff = merged[merged['__parsed_OA'] != merged['__parsed_PO']].copy()
     if diff.empty:
-        return pd.DataFrame()
-
-    def describe_diff(d1, d2):
-        if d1 is None or d2 is None:
-            return "Unknown"
-        days = abs((d2 - d1).days)
-        if days < 7:
-            return "<1 week"
-        elif days < 14:
-            return "1–2 weeks"
-        elif days < 30:
-            return f"{days // 7} weeks"
-        elif days < 60:
-            return "1–2 months"
-        elif days < 365:
-            return f"{days // 30} months"
-        else:
-            return f"{round(days / 365, 1)} years"
-
-    diff['Date Difference'] = diff.apply(
-        lambda row: describe_diff(row['__parsed_OA'], row['__parsed_PO']),
-        axis=1
-    )
+        return pd.DataFrame(columns=DATE_COLUMNS)
+
+    diff['Date Difference'] = describe_date_gaps(diff['__parsed_OA'], diff['__parsed_PO'])
 
     df = diff.rename(columns={
         'Line No': 'Line',
         'Ship Date_OA': 'OA Expected Dates',
         'Ship Date_PO': 'PO Requested Dates'
-    })[['Line', 'OA Expected Dates', 'PO Requested Dates', 'Date Difference']]
+    })[DATE_COLUMNS]
 
     df = df[df['Line'].str.strip().str.isdigit()]
     df = df.sort_values(by='Line', key=lambda col: col.astype(int))
@@ -109,112 +221,466 @@ def calib_match(a, b):
     sb = set(r.strip() for r in re.split(r',\s*', b.upper()) if r)
     return sa == sb
 
-def compare_oa_po(po_df, oa_df):
-    discrepancies = []
-
-    oa_df['__price_float'] = oa_df['Total Price'].apply(parse_price)
-    po_df['__price_float'] = po_df['Total Price'].apply(parse_price)
-    oa_tariffs = oa_df[oa_df['Model Number'].str.contains('TARIFF', case=False, na=False)].copy()
-    po_tariffs = po_df[po_df['Model Number'].str.contains('TARIFF', case=False, na=False)].copy()
-
-    for _, oa_tar in oa_tariffs.iterrows():
-        if not ((po_tariffs['__price_float'] == oa_tar['__price_float']).any()):
-            discrepancies.append({
-                'Discrepancy': f"OA includes a tariff charge ${oa_tar['Total Price']} but PO does not."
-            })
-    for _, po_tar in po_tariffs.iterrows():
-        if not ((oa_tariffs['__price_float'] == po_tar['__price_float']).any()):
-            discrepancies.append({
-                'Discrepancy': f"PO includes a tariff charge ${po_tar['Total Price']} but OA does not."
-            })
-
-    oa_df = oa_df.loc[~oa_df['Model Number'].str.contains('TARIFF', case=False, na=False)].drop(columns='__price_float')
-    po_df = po_df.loc[~po_df['Model Number'].str.contains('TARIFF', case=False, na=False)].drop(columns='__price_float')
-
-    oa_df = combine_duplicate_lines(oa_df)
-    po_df = combine_duplicate_lines(po_df)
-
-    date_df = compare_dates(oa_df, po_df)
-
-    po_map = {row['Line No']: row for _, row in po_df.iterrows()}
-    oa_map = {row['Line No']: row for _, row in oa_df.iterrows()}
-    all_lines = sorted(set(po_map) | set(oa_map), key=safe_sort_key)
-
-    for ln in all_lines:
-        po = po_map.get(ln)
-        oa = oa_map.get(ln)
-        if po is None:
-            discrepancies.append({'Discrepancy': f"Line {ln}: present in OA but missing in PO."})
-            continue
-        if oa is None:
-            discrepancies.append({'Discrepancy': f"Line {ln}: present in PO but missing in OA."})
-            continue
-        if oa['Model Number'].upper() == 'ORDER TOTAL' and po['Model Number'].upper() == 'ORDER TOTAL':
-            continue
-
-        if po['Model Number'] != oa['Model Number']:
-            diff = highlight_diff(po['Model Number'], oa['Model Number'])
-            discrepancies.append({
-                'Discrepancy': f"Line {ln}: Model Number mismatch → OA: '{oa['Model Number']}' vs PO: '{po['Model Number']}' | Diff: {diff}"
-            })
-        if po['Unit Price'] != oa['Unit Price']:
-            discrepancies.append({
-                'Discrepancy': f"Line {ln}: Unit Price mismatch → OA: {oa['Unit Price']} vs PO: {po['Unit Price']}"
-            })
-        if po['Total Price'] != oa['Total Price']:
-            discrepancies.append({
-                'Discrepancy': f"Line {ln}: Total Price mismatch → OA: {oa['Total Price']} vs PO: {po['Total Price']}"
-            })
-        if oa['Tags'] and oa['Wire-on Tag'] and oa['Tags'] != oa['Wire-on Tag']:
-            discrepancies.append({
-                'Discrepancy': f"Line {ln}: OA Wire-on Tag mismatch → Tags: {oa['Tags']} vs Wire-on Tag: {oa['Wire-on Tag']}"
-            })
-
-        oa_has = oa['Has Tag?'] == 'Y'
-        po_has = po['Has Tag?'] == 'Y'
-        oa_tags = set(oa['Tags'].split(', ')) if oa['Tags'] else set()
-        po_tags = set(po['Tags'].split(', ')) if po['Tags'] else set()
-        if oa_has and not po_has:
-            discrepancies.append({'Discrepancy': f"Line {ln}: OA has tag(s) but PO does not"})
-        elif po_has and not oa_has:
-            discrepancies.append({'Discrepancy': f"Line {ln}: PO has tag(s) but OA does not"})
-        elif oa_has and po_has and oa_tags != po_tags:
-            discrepancies.append({
-                'Discrepancy': f"Line {ln}: Tag mismatch → OA: {sorted(oa_tags)} vs PO: {sorted(po_tags)}"
-            })
-
-        if not (oa['Calib Data?'] == 'N' and po['Calib Data?'] == 'N'):
-            if oa['Calib Data?'] != po['Calib Data?']:
-                discrepancies.append({
-                    'Discrepancy': f"Line {ln}: Calibration data missing on one side → OA: {oa['Calib Data?']} vs PO: {po['Calib Data?']}"
-                })
-            else:
-                a = normalize_unit(oa['Calib Details'])
-                b = normalize_unit(po['Calib Details'])
-                if not calib_match(a, b):
-                    discrepancies.append({
-                        'Discrepancy': f"Line {ln}: Calibration mismatch → OA: {oa['Calib Details']} vs PO: {po['Calib Details']}"
-                    })
-
-    oa_tot = oa_df[oa_df['Model Number'] == 'ORDER TOTAL']['Total Price'].values
-    po_tot = po_df[po_df['Model Number'] == 'ORDER TOTAL']['Total Price'].values
-    if oa_tot.size and po_tot.size and oa_tot[0] != po_tot[0]:
-        try:
-            o = float(oa_tot[0].replace(',', ''))
-            p = float(po_tot[0].replace(',', ''))
-            tariff_sum = oa_tariffs['__price_float'].sum()
-            if abs((o - p) - tariff_sum) < 0.01:
-                diff_amt = abs(o - p)
-                discrepancies.append({
-                    'Discrepancy': f"Order Total mismatch → OA: {oa_tot[0]} vs PO: {po_tot[0]}. Difference ${diff_amt:.2f} is exactly due to tariff charges."
-                })
+def skipped_sections(po_df, oa_df, skip=()):
+    # optional sections ('tags', 'calibration') left out of the comparison:
+    # those either parser skipped, plus any the caller asks to skip
+    return frozenset(skip) | frozenset(po_df.attrs.get('skipped', ())) | frozenset(oa_df.attrs.get('skipped', ()))
+
+def line_discrepancies(po_df, oa_df, tol_cents=0, skip=()):
+    return [msg for _, msg in line_hits(po_df, oa_df, tol_cents, skip)]
+
+def line_hits(po_df, oa_df, tol_cents=0, skip=()):
+    # Columnar per-line comparison of the combined frames: one outer merge on
+    # Line No, a boolean mask per check, and messages formatted only for the
+    # rows a mask selects. Messages come out grouped by line (safe_sort_key
+    # order) and, within a line, in the order the checks are listed.
+    # Prices compare in cents within tol_cents; where either side has no
+    # cents value (unparseable, or differing rows merged) the text is compared.
+    # Checks for sections in skip ('tags', 'calibration') are left out.
+    # Returns (line, message) pairs.
+    m = pd.merge(po_df, oa_df, on='Line No', how='outer', suffixes=('_PO', '_OA'), indicator=True)
+    m['__key'] = m['Line No'].map(safe_sort_key)
+    m = m.sort_values('__key', kind='stable', ignore_index=True)
+
+    only_oa = (m['_merge'] == 'right_only').to_numpy()
+    only_po = (m['_merge'] == 'left_only').to_numpy()
+    both    = (m['_merge'] == 'both').to_numpy()
+
+    def col(name):
+        return m[name].to_numpy(dtype=object)
+
+    ln = col('Line No')
+    oa_model, po_model = col('Model Number_OA'), col('Model Number_PO')
+    oa_unit,  po_unit  = col('Unit Price_OA'),   col('Unit Price_PO')
+    oa_total, po_total = col('Total Price_OA'),  col('Total Price_PO')
+    def price_diff(price, cents):
+        a, b = _cents_array(m[cents + '_OA']), _cents_array(m[cents + '_PO'])
+        known = ~(np.isnan(a) | np.isnan(b))
+        with np.errstate(invalid='ignore'):
+            return np.where(known, np.abs(a - b) > tol_cents, col(price + '_OA') != col(price + '_PO'))
+
+    unit_diff  = both & price_diff('Unit Price', 'Unit Cents')
+    total_diff = both & price_diff('Total Price', 'Total Cents')
+
+    checks = [
+        (only_oa, lambda i: f"Line {ln[i]}: present in OA but missing in PO."),
+        (only_po, lambda i: f"Line {ln[i]}: present in PO but missing in OA."),
+        (both & (po_model != oa_model), lambda i:
+            f"Line {ln[i]}: Model Number mismatch → OA: '{oa_model[i]}' vs PO: '{po_model[i]}' | Diff: "
+            f"{highlight_diff(po_model[i], oa_model[i])}"),
+        (unit_diff, lambda i:
+            f"Line {ln[i]}: Unit Price mismatch → OA: {oa_unit[i]} vs PO: {po_unit[i]}"),
+        (total_diff, lambda i:
+            f"Line {ln[i]}: Total Price mismatch → OA: {oa_total[i]} vs PO: {po_total[i]}"),
+    ]
+
+    if 'tags' not in skip:
+        oa_tags          = col('Tags_OA')
+        oa_set,  po_set  = col('Tag Set_OA'), col('Tag Set_PO')
+        oa_wire          = col('Wire-on Tag_OA')
+        oa_has = both & (col('Has Tag?_OA') == 'Y')
+        po_has = both & (col('Has Tag?_PO') == 'Y')
+        # frozensets compare directly: order and repeats don't matter
+        tag_diff = oa_has & po_has & (oa_set != po_set)
+        checks += [
+            (both & (oa_tags != '') & (oa_wire != '') & (oa_tags != oa_wire), lambda i:
+                f"Line {ln[i]}: OA Wire-on Tag mismatch → Tags: {oa_tags[i]} vs Wire-on Tag: {oa_wire[i]}"),
+            (oa_has & ~po_has, lambda i: f"Line {ln[i]}: OA has tag(s) but PO does not"),
+            (po_has & ~oa_has, lambda i: f"Line {ln[i]}: PO has tag(s) but OA does not"),
+            (tag_diff, lambda i:
+                f"Line {ln[i]}: Tag mismatch → OA: {sorted(oa_set[i])} vs PO: {sorted(po_set[i])}"),
+        ]
+
+    if 'calibration' not in skip:
+        oa_cd,  po_cd  = col('Calib Data?_OA'),   col('Calib Data?_PO')
+        oa_cal, po_cal = col('Calib Details_OA'), col('Calib Details_PO')
+        calib_any  = both & ~((oa_cd == 'N') & (po_cd == 'N'))
+        calib_side = calib_any & (oa_cd != po_cd)
+        calib_diff = calib_any & ~calib_side & (oa_cal != po_cal)
+        for i in calib_diff.nonzero()[0]:
+            calib_diff[i] = not calib_match(normalize_unit(oa_cal[i]), normalize_unit(po_cal[i]))
+        checks += [
+            (calib_side, lambda i:
+                f"Line {ln[i]}: Calibration data missing on one side → OA: {oa_cd[i]} vs PO: {po_cd[i]}"),
+            (calib_diff, lambda i:
+                f"Line {ln[i]}: Calibration mismatch → OA: {oa_cal[i]} vs PO: {po_cal[i]}"),
+        ]
+    hits = [(i, order, build) for order, (mask, build) in enumerate(checks) for i in mask.nonzero()[0]]
+    hits.sort(key=lambda h: (h[0], h[1]))
+    return [(ln[i], build(i)) for i, _, build in hits]
+
+def tag_index(df):
+    # tag -> lines carrying it, built once per document
+    index = {}
+    for ln, tags in zip(df['Line No'].tolist(), df['Tag Set'].tolist()):
+        for tag in tags:
+            if tag in index:
+                index[tag].append(ln)
             else:
-                discrepancies.append({
-                    'Discrepancy': f"Order Total mismatch → OA: {oa_tot[0]} vs PO: {po_tot[0]}"
-                })
-        except:
-            discrepancies.append({
-                'Discrepancy': "Could not compare Order Totals due to formatting."
-            })
-
-    return pd.DataFrame(discrepancies), date_df
+                index[tag] = [ln]
+    return index
+
+def moved_tags(po_df, oa_df):
+    shared = set(po_df['Line No']) & set(oa_df['Line No'])
+    return moved_tags_between(tag_index(po_df), tag_index(oa_df), shared)
+
+def moved_tags_between(po_idx, oa_idx, shared):
+    # tags both documents carry, but on different lines; ordered by the
+    # lowest line involved. Only lines both documents have count (a missing
+    # line is reported on its own), and the tag must have left a line on
+    # each side: gaining or losing one is a per-line tag mismatch
+    moves = []
+    for tag in oa_idx.keys() & po_idx.keys():
+        oa_lines, po_lines = oa_idx[tag], po_idx[tag]
+        oa_on = {ln for ln in oa_lines if ln in shared}
+        po_on = {ln for ln in po_lines if ln in shared}
+        if oa_on - po_on and po_on - oa_on:
+            first = min(map(safe_sort_key, oa_lines + po_lines))
+            moves.append((first, tag, ', '.join(oa_lines), ', '.join(po_lines)))
+    moves.sort()
+    return [f"Tag {tag} moved → OA line(s): {oa} vs PO line(s): {po}" for _, tag, oa, po in moves]
+
+def split_tariffs(df):
+    # (tariff rows, everything else), both with cents and tag sets in place
+    df = with_tag_sets(with_price_cents(df))
+    is_tariff = df['Model Number'].str.contains('TARIFF', case=False, na=False)
+    return df[is_tariff], df.loc[~is_tariff]
+
+def tariff_discrepancies(po_tariffs, oa_tariffs, tol_cents=0):
+    oa_tar_c = _cents_array(oa_tariffs['Total Cents'])
+    po_tar_c = _cents_array(po_tariffs['Total Cents'])
+    msgs = []
+    for price, cents in zip(oa_tariffs['Total Price'], oa_tar_c):
+        if not (np.abs(po_tar_c - cents) <= tol_cents).any():
+            msgs.append(f"OA includes a tariff charge ${price} but PO does not.")
+    for price, cents in zip(po_tariffs['Total Price'], po_tar_c):
+        if not (np.abs(oa_tar_c - cents) <= tol_cents).any():
+            msgs.append(f"PO includes a tariff charge ${price} but OA does not.")
+    return msgs
+
+def order_total_discrepancies(po_total, oa_total, oa_tariffs, tol_cents=0):
+    (po_tot, po_tot_c), (oa_tot, oa_tot_c) = po_total, oa_total
+    if not (oa_tot and po_tot and oa_tot != po_tot):
+        return []
+    if oa_tot_c is None or po_tot_c is None:
+        return ["Could not compare Order Totals due to formatting."]
+    diff = oa_tot_c - po_tot_c
+    if abs(diff) <= tol_cents:
+        return []
+    tariff_sum = np.nansum(_cents_array(oa_tariffs['Total Cents']))
+    if abs(diff - tariff_sum) <= tol_cents:
+        return [f"Order Total mismatch → OA: {oa_tot} vs PO: {po_tot}. Difference ${abs(diff) / 100:.2f} is exactly due to tariff charges."]
+    return [f"Order Total mismatch → OA: {oa_tot} vs PO: {po_tot}"]
+
+def compare_oa_po(po_df, oa_df, price_tolerance=PRICE_TOLERANCE, skip=()):
+    # skip: optional sections to leave out; sections either parser skipped
+    # (df.attrs['skipped']) are always left out
+    tol  = round(price_tolerance * 100)
+    skip = skipped_sections(po_df, oa_df, skip)
+    po_total, oa_total = order_total(po_df), order_total(oa_df)
+
+    with perf.span('compare.tariffs'):
+        po_tariffs, po_df = split_tariffs(po_df)
+        oa_tariffs, oa_df = split_tariffs(oa_df)
+        discrepancies = tariff_discrepancies(po_tariffs, oa_tariffs, tol)
+
+    with perf.span('compare.combine'):
+        oa_df = combine_duplicate_lines(oa_df)
+        po_df = combine_duplicate_lines(po_df)
+
+    with perf.span('compare.dates') as sp:
+        date_df = compare_dates(oa_df, po_df)
+        sp.count('date_discrepancies', len(date_df))
+
+    with perf.span('compare.lines'):
+        discrepancies += line_discrepancies(po_df, oa_df, tol, skip)
+
+    if 'tags' not in skip:
+        with perf.span('compare.tag_moves') as sp:
+            moves = moved_tags(po_df, oa_df)
+            discrepancies += moves
+            sp.count('moved_tags', len(moves))
+
+    discrepancies += order_total_discrepancies(po_total, oa_total, oa_tariffs, tol)
+
+    perf.count('discrepancies', len(discrepancies))
+    return pd.DataFrame([{'Discrepancy': msg} for msg in discrepancies]), date_df
+
+# ── Incremental re-comparison ──
+# For a PO/OA pair compared again after one side is revised. Each side's
+# tariff split, combined frame, tag index and per-line fingerprints (hashes
+# of the comparable fields) are kept until that document changes. Only lines
+# whose (PO, OA) fingerprint pair changed are re-diffed; their messages and
+# date rows are patched into the stored results. compare() returns exactly
+# what compare_oa_po would for the same pair. Frames are treated as
+# read-only: passing the same object again skips even the change check.
+
+def frame_digest(df):
+    cols = [c for c in ['Line No'] + COMBINE_COLS if c in df]
+    h = pd.util.hash_pandas_object(df[cols], index=False).to_numpy()
+    return hashlib.sha1(h.tobytes()).hexdigest() + '|' + str(df.attrs.get('order_total', ''))
+
+def line_fingerprints(combined):
+    cols = COMBINE_COLS + [c for c in COMBINE_CENTS if c in combined]
+    return dict(zip(combined['Line No'], pd.util.hash_pandas_object(combined[cols], index=False).tolist()))
+
+class IncrementalComparer:
+    def __init__(self, price_tolerance=PRICE_TOLERANCE):
+        self.price_tolerance = price_tolerance
+        self.reset()
+
+    def reset(self):
+        self._sides    = {'po': None, 'oa': None}
+        self._pairs    = {}   # line -> (PO fingerprint, OA fingerprint) as last diffed
+        self._messages = {}   # line -> its line_hits messages
+        self._dates    = {}   # line -> its compare_dates row
+        self._skip     = frozenset()
+        self.last_rediffed = 0
+
+    def _side(self, kind, df, key):
+        side = self._sides[kind]
+        if side is not None and side['frame'] is df:
+            return side
+        key = key or frame_digest(df)
+        if side is None or side['key'] != key:
+            with perf.span('compare.prepare'):
+                tariffs, body = split_tariffs(df)
+                combined = combine_duplicate_lines(body)
+                side = {
+                    'frame':        df,
+                    'key':          key,
+                    'total':        order_total(df),
+                    'tariffs':      tariffs,
+                    'combined':     combined,
+                    'fingerprints': line_fingerprints(combined),
+                    'tags':         tag_index(combined),
+                }
+            self._sides[kind] = side
+        side['frame'] = df
+        return side
+
+    def compare(self, po_df, oa_df, price_tolerance=None, po_key=None, oa_key=None):
+        # po_key / oa_key: any string that changes with the document (e.g.
+        # parse_cache.content_key); without one the frame itself is hashed
+        if price_tolerance is not None and price_tolerance != self.price_tolerance:
+            self.price_tolerance = price_tolerance
+            self.reset()
+        skip = skipped_sections(po_df, oa_df)
+        if skip != self._skip:
+            # stored messages were built with other checks
+            self.reset()
+            self._skip = skip
+        tol = round(self.price_tolerance * 100)
+        po, oa = self._side('po', po_df, po_key), self._side('oa', oa_df, oa_key)
+
+        po_fp, oa_fp = po['fingerprints'], oa['fingerprints']
+        pairs   = {ln: (po_fp.get(ln), oa_fp.get(ln)) for ln in po_fp.keys() | oa_fp.keys()}
+        changed = [ln for ln, pair in pairs.items() if self._pairs.get(ln) != pair]
+        for ln in changed + list(self._pairs.keys() - pairs.keys()):
+            self._messages.pop(ln, None)
+            self._dates.pop(ln, None)
+        if changed:
+            po_sub = po['combined'][po['combined']['Line No'].isin(changed)]
+            oa_sub = oa['combined'][oa['combined']['Line No'].isin(changed)]
+            with perf.span('compare.dates'):
+                for row in compare_dates(oa_sub, po_sub).itertuples(index=False):
+                    self._dates[row[0]] = tuple(row)
+            with perf.span('compare.lines') as sp:
+                for ln, msg in line_hits(po_sub, oa_sub, tol, skip):
+                    self._messages.setdefault(ln, []).append(msg)
+                sp.count('rediffed_lines', len(changed))
+        self._pairs = pairs
+        self.last_rediffed = len(changed)
+
+        discrepancies = tariff_discrepancies(po['tariffs'], oa['tariffs'], tol)
+        for ln in sorted(self._messages, key=lambda ln: (safe_sort_key(ln), ln)):
+            discrepancies += self._messages[ln]
+        if 'tags' not in skip:
+            discrepancies += moved_tags_between(po['tags'], oa['tags'], po_fp.keys() & oa_fp.keys())
+        discrepancies += order_total_discrepancies(po['total'], oa['total'], oa['tariffs'], tol)
+
+        rows    = [self._dates[ln] for ln in sorted(self._dates, key=int)]
+        date_df = pd.DataFrame(rows, columns=DATE_COLUMNS)
+        perf.count('discrepancies', len(discrepancies))
+        return pd.DataFrame([{'Discrepancy': msg} for msg in discrepancies]), date_df
+
+# ── Multi-document reconciliation ──
+# One PO split over several OAs (one per ship release), or the reverse. Each
+# document is prepared once (tariff split, combined lines, per-line qty);
+# each side's documents are then merged into one line index — quantities and
+# total prices summed, unit prices kept where every document agrees, tags
+# unioned — and compared in a single line_hits pass, so the work grows with
+# the number of lines, not with the number of document pairs. On top of the
+# usual checks, each line's acknowledged quantity is checked against the
+# ordered one, tariffs are compared as pooled amounts (a charge may be
+# allocated across releases), and order totals are summed per side.
+
+ALLOCATION_COLUMNS = ['Line', 'Model Number', 'PO Qty', 'OA Qty', 'Status', 'PO Documents', 'OA Documents']
+RELEASE_DATE_COLUMNS = DATE_COLUMNS + ['OA Document', 'PO Document']
+
+def _labelled(docs, kind):
+    # {label: frame} as given, or a list labelled 'OA 1', 'OA 2', …
+    if isinstance(docs, pd.DataFrame):
+        docs = [docs]
+    if not isinstance(docs, dict):
+        docs = {f"{kind} {i}": df for i, df in enumerate(docs, 1)}
+    if not docs:
+        raise ValueError(f"no {kind} documents to reconcile")
+    return docs
+
+def _quantity(text):
+    # combined Qty ('2', or '2, 3' where a document repeats a line with
+    # different values) -> number, None when any part is unparseable
+    parts = [parse_price(p) for p in str(text).split(', ')]
+    return None if None in parts else sum(parts)
+
+def _fmt_qty(q):
+    return f"{q:,.0f}" if float(q).is_integer() else f"{q:,}"
+
+def prepare_document(df, label):
+    tariffs, body = split_tariffs(df)
+    combined = combine_duplicate_lines(body)
+    qty = combined['Qty'].map({v: _quantity(v) for v in combined['Qty'].unique()})
+    return {
+        'label':    label,
+        'frame':    df,
+        'total':    order_total(df),
+        'tariffs':  tariffs,
+        'combined': combined.assign(Document=label, **{'__qty': qty.astype('float64')}),
+    }
+
+def merge_documents(prepared):
+    # one combined frame for a side: Line No, the COMBINE_COLS and cents,
+    # with Qty / Total Price summed across the documents carrying a line
+    rows = pd.concat([p['combined'] for p in prepared], ignore_index=True)
+    if len(prepared) == 1:
+        return prepared[0]['combined'].drop(columns=['Document', '__qty']), rows
+    merged = combine_duplicate_lines(rows.drop(columns=['Document', '__qty']))
+
+    by_line = rows.groupby('Line No', sort=True)
+    qty     = by_line['__qty'].sum(min_count=1).where(by_line['__qty'].count() == by_line.size())
+    cents   = by_line['Total Cents'].sum(min_count=1).where(by_line['Total Cents'].count() == by_line.size())
+    qty, cents = qty.reindex(merged['Line No']).to_numpy(), cents.reindex(merged['Line No']).to_numpy()
+
+    known_q = ~pd.isna(qty)
+    known_c = ~pd.isna(cents)
+    merged.loc[known_q, 'Qty'] = [_fmt_qty(q) for q in qty[known_q]]
+    merged.loc[known_c, 'Total Price'] = [f"{c / 100:,.2f}" for c in cents[known_c]]
+    merged['Total Cents'] = pd.array(np.where(known_c, cents, None), dtype='Int64')
+    return merged, rows
+
+def _allocations(po_rows, oa_rows):
+    # per line: ordered vs acknowledged quantity and which documents carry it
+    def side(rows):
+        g = rows.groupby('Line No', sort=False)
+        qty = g['__qty'].sum(min_count=1).where(g['__qty'].count() == g.size())
+        docs = (rows['Document'] + ': ' + rows['Qty']).groupby(rows['Line No'], sort=False).agg(', '.join)
+        return pd.DataFrame({'Qty': qty, 'Documents': docs, 'Model Number': g['Model Number'].first()})
+
+    po, oa = side(po_rows), side(oa_rows)
+    m = po.join(oa, how='outer', lsuffix='_PO', rsuffix='_OA')
+    po_q, oa_q = m['Qty_PO'].to_numpy(dtype='float64'), m['Qty_OA'].to_numpy(dtype='float64')
+    on_po, on_oa = m['Documents_PO'].notna().to_numpy(), m['Documents_OA'].notna().to_numpy()
+    with np.errstate(invalid='ignore'):
+        status = np.select(
+            [~on_oa, ~on_po, np.isnan(po_q) | np.isnan(oa_q), oa_q < po_q, oa_q > po_q],
+            ['not acknowledged', 'not ordered', 'unknown', 'under', 'over'], default='ok')
+    out = pd.DataFrame({
+        'Line':         m.index.astype(str),
+        'Model Number': m['Model Number_PO'].fillna(m['Model Number_OA']).to_numpy(),
+        'PO Qty':       [_fmt_qty(q) if q == q else '' for q in po_q],
+        'OA Qty':       [_fmt_qty(q) if q == q else '' for q in oa_q],
+        'Status':       status,
+        'PO Documents': m['Documents_PO'].fillna('').to_numpy(),
+        'OA Documents': m['Documents_OA'].fillna('').to_numpy(),
+    })
+    out['__key'] = out['Line'].map(safe_sort_key)
+    return out.sort_values(['__key', 'Line'], ignore_index=True).drop(columns='__key')[ALLOCATION_COLUMNS]
+
+def allocation_hits(alloc):
+    # (line, message) for lines acknowledged short of, or beyond, the order
+    off = alloc[alloc['Status'].isin(['under', 'over'])]
+    return [(ln, f"Line {ln}: {status}-acknowledged → PO qty {po_q} vs OA qty {oa_q} ({docs})")
+            for ln, status, po_q, oa_q, docs in zip(off['Line'], off['Status'], off['PO Qty'],
+                                                    off['OA Qty'], off['OA Documents'])]
+
+def release_dates(po_rows, oa_rows):
+    # compare_dates per document row, so each release keeps its own date
+    oa = oa_rows[['Line No', 'Ship Date', 'Document']]
+    po = po_rows[['Line No', 'Ship Date', 'Document']]
+    m = pd.merge(oa, po, on='Line No', suffixes=('_OA', '_PO'))
+    oa_d, po_d = parse_ship_dates(m['Ship Date_OA']), parse_ship_dates(m['Ship Date_PO'])
+    diff = m[(oa_d != po_d).to_numpy()]
+    if diff.empty:
+        return pd.DataFrame(columns=RELEASE_DATE_COLUMNS)
+    df = pd.DataFrame({
+        'Line':               diff['Line No'],
+        'OA Expected Dates':  diff['Ship Date_OA'],
+        'PO Requested Dates': diff['Ship Date_PO'],
+        'Date Difference':    describe_date_gaps(oa_d[diff.index], po_d[diff.index]),
+        'OA Document':        diff['Document_OA'],
+        'PO Document':        diff['Document_PO'],
+    })
+    df = df[df['Line'].str.strip().str.isdigit()]
+    return df.sort_values(by='Line', key=lambda col: col.astype(int), kind='stable', ignore_index=True)
+
+def _summed_total(prepared):
+    # (printed, cents) of a side's order totals; blank unless every document has one
+    cents = [p['total'][1] for p in prepared]
+    if len(prepared) == 1:
+        return prepared[0]['total']
+    if any(c is None for c in cents):
+        return '', None
+    return f"{sum(cents) / 100:,.2f}", sum(cents)
+
+def pooled_tariff_discrepancies(po_tariffs, oa_tariffs, tol_cents=0):
+    # a charge split differently across releases is fine as long as the
+    # amounts add up; otherwise the unmatched charges are listed
+    po_sum = np.nansum(_cents_array(po_tariffs['Total Cents']))
+    oa_sum = np.nansum(_cents_array(oa_tariffs['Total Cents']))
+    if abs(po_sum - oa_sum) <= tol_cents:
+        return []
+    return tariff_discrepancies(po_tariffs, oa_tariffs, tol_cents) or [
+        f"Tariff charges mismatch → OA: ${oa_sum / 100:,.2f} vs PO: ${po_sum / 100:,.2f}"]
+
+def reconcile_many(po_docs, oa_docs, price_tolerance=PRICE_TOLERANCE, skip=()):
+    # po_docs / oa_docs: {label: frame}, a list of frames, or a single frame.
+    # Returns (discrepancies, release dates, allocation) frames.
+    po_docs, oa_docs = _labelled(po_docs, 'PO'), _labelled(oa_docs, 'OA')
+    tol  = round(price_tolerance * 100)
+    skip = frozenset(skip).union(*(df.attrs.get('skipped', ()) for df in (*po_docs.values(), *oa_docs.values())))
+
+    with perf.span('reconcile.prepare') as sp:
+        po = [prepare_document(df, label) for label, df in po_docs.items()]
+        oa = [prepare_document(df, label) for label, df in oa_docs.items()]
+        sp.count('documents', len(po) + len(oa))
+
+    with perf.span('reconcile.merge'):
+        po_df, po_rows = merge_documents(po)
+        oa_df, oa_rows = merge_documents(oa)
+        po_tariffs = pd.concat([p['tariffs'] for p in po], ignore_index=True)
+        oa_tariffs = pd.concat([p['tariffs'] for p in oa], ignore_index=True)
+
+    with perf.span('compare.tariffs'):
+        discrepancies = pooled_tariff_discrepancies(po_tariffs, oa_tariffs, tol)
+
+    with perf.span('compare.dates') as sp:
+        date_df = release_dates(po_rows, oa_rows)
+        sp.count('date_discrepancies', len(date_df))
+
+    with perf.span('compare.lines'):
+        alloc = _allocations(po_rows, oa_rows)
+        hits  = line_hits(po_df, oa_df, tol, skip) + allocation_hits(alloc)
+        hits.sort(key=lambda h: safe_sort_key(h[0]))  # stable: a line's own order is kept
+        discrepancies += [msg for _, msg in hits]
+
+    if 'tags' not in skip:
+        with perf.span('compare.tag_moves') as sp:
+            moves = moved_tags(po_df, oa_df)
+            discrepancies += moves
+            sp.count('moved_tags', len(moves))
+
+    discrepancies += order_total_discrepancies(_summed_total(po), _summed_total(oa), oa_tariffs, tol)
+
+    perf.count('discrepancies', len(discrepancies))
+    return pd.DataFrame([{'Discrepancy': msg} for msg in discrepancies]), date_df, alloc
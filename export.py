@@ -0,0 +1,87 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+# ── Result export ──
+# Downloads are built only when asked for and kept in an ExportCache keyed by
+# the result they came from, so a rerun never re-serialises a table. CSV is
+# written chunk by chunk straight into one bytes buffer (no full str copy
+# next to it); Parquet needs pyarrow.
+
+EXPORT_FORMATS = ('csv', 'parquet')
+CHUNK_ROWS     = 10_000
+MIME = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def frame_digest(df):
+    # content hash of a frame, for callers without a key of their own
+    h = hashlib.sha1("\x1f".join(map(str, df.columns)).encode('utf-8'))
+    h.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return h.hexdigest()
+
+
+def iter_csv(df, chunk_rows=CHUNK_ROWS):
+    # encoded CSV, header first, then chunk_rows rows at a time
+    for start in range(0, max(len(df), 1), chunk_rows):
+        part = df.iloc[start:start + chunk_rows]
+        yield part.to_csv(index=False, header=start == 0).encode('utf-8')
+
+
+def write_csv(df, fh, chunk_rows=CHUNK_ROWS):
+    for chunk in iter_csv(df, chunk_rows):
+        fh.write(chunk)
+
+
+def to_bytes(df, fmt='csv'):
+    buf = io.BytesIO()
+    if fmt == 'parquet':
+        if not parquet_available():
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow)")
+        df.to_parquet(buf, index=False)
+    elif fmt == 'csv':
+        write_csv(df, buf)
+    else:
+        raise ValueError(f"unknown export format {fmt!r} (expected one of {', '.join(EXPORT_FORMATS)})")
+    return buf.getvalue()
+
+
+class ExportCache:
+    # (key, fmt) → serialised bytes, least recently used dropped past max_bytes
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries  = OrderedDict()
+        self._size     = 0
+        self._lock     = threading.Lock()
+
+    def peek(self, key, fmt):
+        with self._lock:
+            data = self._entries.get((key, fmt))
+            if data is not None:
+                self._entries.move_to_end((key, fmt))
+            return data
+
+    def get(self, df, fmt='csv', key=None):
+        key  = key or frame_digest(df)
+        data = self.peek(key, fmt)
+        if data is None:
+            data = to_bytes(df, fmt)
+            with self._lock:
+                if (key, fmt) not in self._entries:
+                    self._entries[(key, fmt)] = data
+                    self._size += len(data)
+                while self._size > self.max_bytes and len(self._entries) > 1:
+                    _, old = self._entries.popitem(last=False)
+                    self._size -= len(old)
+        return data
@@ -0,0 +1,365 @@
+import argparse
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+
+try:
+    import resource
+except ImportError:  # not on Windows; the sandbox then runs without a memory cap
+    resource = None
+
+import perf
+from ingest import PdfSource
+
+# ── PDF text extraction ──
+# pdfplumber's layout analysis is CPU-bound, so long documents are split
+# into contiguous page ranges and extracted in a process pool. Pages are
+# re-joined in page order, giving exactly the serial output.
+# iter_pages hands pages over one at a time for streaming parsers.
+# Input goes through ingest.PdfSource, so workers map the same file (or
+# inherit the same buffer) rather than each receiving a pickled copy.
+# Ranges are at most PAGE_BATCH pages and only a few are in flight at once,
+# so a consumer that stops at the footer leaves the rest unextracted.
+
+DEFAULT_WORKERS = int(os.environ.get("OAPO_EXTRACT_WORKERS", min(4, os.cpu_count() or 1)))
+PAGE_BATCH      = 8
+
+
+def _extract_range(handle, start, stop):
+    source = PdfSource.attach(handle)
+    with source.open() as pdf:
+        return [pdf.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _page_ranges(n_pages, workers, batch=PAGE_BATCH):
+    size = min(-(-n_pages // workers), batch)
+    return [(s, min(s + size, n_pages)) for s in range(0, n_pages, size)]
+
+
+def iter_pages(file, workers=None, stats=None, sandbox=None):
+    # yields page texts in order as they become available; stats, if given,
+    # gets the document's page count under 'pages_total'
+    workers = DEFAULT_WORKERS if workers is None else workers
+    if SANDBOX if sandbox is None else sandbox:
+        yield from iter_pages_sandboxed(file, stats, workers=workers)
+        return
+    source  = PdfSource.of(file)
+    try:
+        with source.open() as pdf:
+            n_pages = len(pdf.pages)
+            if stats is not None:
+                stats['pages_total'] = n_pages
+            # serial fallback: single page, or nothing to fan out to
+            if n_pages <= 1 or workers <= 1:
+                for page in pdf.pages:
+                    yield page.extract_text() or ""
+                    page.close()  # drop the page's cached layout objects
+                return
+
+        workers = min(workers, n_pages)
+        ranges  = iter(_page_ranges(n_pages, workers))
+        with source.shared() as handle:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            try:
+                # two ranges per worker in flight keeps the pool busy while pages are consumed
+                pending = deque(pool.submit(_extract_range, handle, s, e)
+                                for s, e in (r for _, r in zip(range(2 * workers), ranges)))
+                while pending:
+                    chunk = pending.popleft().result()
+                    nxt   = next(ranges, None)
+                    if nxt is not None:
+                        pending.append(pool.submit(_extract_range, handle, *nxt))
+                    yield from chunk
+            finally:
+                # a consumer that stops early doesn't wait on ranges nobody will read
+                pool.shutdown(wait=True, cancel_futures=True)
+    finally:
+        if source is not file:
+            source.close()  # only sources opened here; callers own theirs
+
+
+# ── Sandboxed extraction ──
+# A pathological PDF (huge vector drawings, thousands of tiny text objects)
+# can keep pdfplumber busy for minutes and gigabytes. With sandbox=True (the
+# default; OAPO_SANDBOX=0 turns it off) pages are extracted in child
+# processes, one page at a time, under a per-page timeout, a per-document
+# deadline and an address space cap. The first page is read on its own,
+# which also gives the page count; the rest are split into ranges like the
+# inline pool, one child per range and up to `workers` at once. A page that
+# times out, runs out of memory or crashes its child comes back as "" and
+# that range resumes in a fresh child from the next page; pages past the
+# document deadline are not extracted. Either way the pages are listed in
+# stats['page_failures'] as (page number, reason), so the parse is partial
+# rather than hung.
+
+SANDBOX      = os.environ.get("OAPO_SANDBOX", "1") == "1"
+PAGE_TIMEOUT = float(os.environ.get("OAPO_PAGE_TIMEOUT", "30"))     # seconds
+DOC_TIMEOUT  = float(os.environ.get("OAPO_DOC_TIMEOUT", "300"))     # seconds
+MEMORY_MB    = int(os.environ.get("OAPO_EXTRACT_MEMORY_MB", "2048"))  # on top of the child's start size
+OOM_EXIT     = 86  # child exit status when it couldn't even report running out of memory
+
+
+def _cap_memory(memory_mb):
+    # RLIMIT_AS counts what the child inherited too, so the cap is relative
+    # to its size at start
+    if resource is None or not memory_mb:
+        return
+    try:
+        with open('/proc/self/statm') as fh:
+            base = int(fh.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        base = 0
+    limit = base + memory_mb * 2**20
+    hard  = resource.getrlimit(resource.RLIMIT_AS)[1]
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _out_of_memory(e):
+    # pdfplumber re-raises pdfminer's errors as PdfminerException, a
+    # MemoryError under the cap included, so look down the chain
+    seen = set()
+    while e is not None and id(e) not in seen:
+        if isinstance(e, MemoryError):
+            return True
+        seen.add(id(e))
+        e = e.__cause__ or e.__context__
+    return False
+
+
+def _reply(conn, msg):
+    # under the cap even pickling the reply can fail; the child then exits
+    # with OOM_EXIT and the parent records the page as out of memory
+    try:
+        conn.send(msg)
+    except MemoryError:
+        os._exit(OOM_EXIT)
+
+
+def _sandbox_worker(handle, start, stop, conn, memory_mb):
+    # child: ('pages', n), then ('page', i, text) or ('failed', i, reason,
+    # child exits) per page from start up to stop (None: the end);
+    # ('fatal', reason) if the document won't open
+    try:
+        _cap_memory(memory_mb)
+        with PdfSource.attach(handle).open() as pdf:
+            n_pages = len(pdf.pages)
+            conn.send(('pages', n_pages))
+            for i in range(start, n_pages if stop is None else min(stop, n_pages)):
+                try:
+                    page = pdf.pages[i]
+                    text = page.extract_text() or ""
+                    page.close()
+                except Exception as e:
+                    # after these the heap may be in no state to go on, so the
+                    # child stops and the next page gets a fresh one
+                    oom  = _out_of_memory(e)
+                    done = oom or isinstance(e, SystemError)
+                    _reply(conn, ('failed', i, 'out of memory' if oom else f"{type(e).__name__}: {e}", done))
+                    if done:
+                        return
+                    continue
+                _reply(conn, ('page', i, text))
+    except Exception as e:
+        _reply(conn, ('fatal', 'out of memory' if _out_of_memory(e) else f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def _sandboxed_range(handle, start, stop, info, deadline, page_timeout, memory_mb):
+    # (page index, text, failure reason or None) for pages start..stop-1 in
+    # order (stop=None: to the end); info['pages'] gets the page count
+    ctx  = multiprocessing.get_context()
+    last = stop
+    nxt  = start   # next page to hand out
+    while last is None or nxt < last:
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_sandbox_worker, args=(handle, nxt, last, send, memory_mb), daemon=True)
+        proc.start()
+        send.close()
+        reason = None
+        try:
+            while last is None or nxt < last:
+                wait = min(page_timeout, deadline - time.monotonic())
+                if wait <= 0 or not recv.poll(wait):
+                    reason = f"timed out after {page_timeout:g}s" if wait >= page_timeout else 'document timeout'
+                    break
+                try:
+                    msg = recv.recv()
+                except EOFError:
+                    proc.join(1)
+                    # a C-level allocation failing under the cap usually ends in a signal
+                    code = proc.exitcode
+                    if code == OOM_EXIT:
+                        reason = 'out of memory'
+                    elif code is not None and code < 0:
+                        reason = f"extraction crashed (signal {-code}, likely the memory cap)"
+                    else:
+                        reason = f"extraction crashed (exit code {code})"
+                    break
+                if msg[0] == 'pages':
+                    info['pages'] = msg[1]
+                    last = msg[1] if last is None else min(last, msg[1])
+                elif msg[0] == 'fatal':
+                    raise RuntimeError(f"could not open the PDF: {msg[1]}")
+                elif msg[0] == 'page':
+                    nxt += 1
+                    yield msg[1], msg[2], None
+                else:
+                    nxt += 1
+                    yield msg[1], "", msg[2]
+                    if msg[3]:
+                        break  # the child has exited; carry on in a new one
+        finally:
+            if proc.is_alive():
+                proc.kill()
+            proc.join()
+            recv.close()
+
+        if reason is None:
+            continue
+        if 'pages' not in info:
+            # no child has opened the document yet
+            raise RuntimeError(f"could not open the PDF: {reason}")
+        # the page in hand failed; past the deadline, so do all the rest
+        end = last if reason == 'document timeout' else nxt + 1
+        for i in range(nxt, end):
+            nxt += 1
+            yield i, "", reason
+
+
+def _sandboxed_rest(run, info, workers):
+    # pages after the first, a range per child, up to workers children at once
+    n_pages = info.get('pages', 0)
+    if n_pages <= 1:
+        return
+    ranges = iter([(s + 1, e + 1) for s, e in _page_ranges(n_pages - 1, workers)])
+    pool   = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="oapo-sandbox")
+    try:
+        pending = deque(pool.submit(lambda r: list(run(*r)), r) for _, r in zip(range(2 * workers), ranges))
+        while pending:
+            chunk = pending.popleft().result()
+            nxt   = next(ranges, None)
+            if nxt is not None:
+                pending.append(pool.submit(lambda r: list(run(*r)), nxt))
+            yield from chunk
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_pages_sandboxed(file, stats=None, page_timeout=None, doc_timeout=None, memory_mb=None, workers=None):
+    page_timeout = PAGE_TIMEOUT if page_timeout is None else page_timeout
+    doc_timeout  = DOC_TIMEOUT if doc_timeout is None else doc_timeout
+    memory_mb    = MEMORY_MB if memory_mb is None else memory_mb
+    workers      = DEFAULT_WORKERS if workers is None else workers
+    stats        = {} if stats is None else stats
+    failures     = stats.setdefault('page_failures', [])
+    deadline     = time.monotonic() + doc_timeout
+
+    source = PdfSource.of(file)
+    info   = {}
+    try:
+        with source.shared() as handle:
+            run = partial(_sandboxed_range, handle, info=info, deadline=deadline,
+                          page_timeout=page_timeout, memory_mb=memory_mb)
+            # serially, or the first page alone and then the rest fanned out
+            pages = run(0, None) if workers <= 1 else chain(run(0, 1), _sandboxed_rest(run, info, workers))
+            for i, text, reason in pages:
+                stats['pages_total'] = info.get('pages', 0)
+                if reason is not None:
+                    failures.append((i + 1, reason))
+                    perf.count('failed_pages')
+                yield text
+            if 'pages' in info:
+                stats['pages_total'] = info['pages']
+    finally:
+        if source is not file:
+            source.close()
+
+
+# ── Page selection ──
+# Order documents end at a footer and vendors append pages of terms and
+# conditions after it. select_pages passes pages through until stop(page)
+# says the footer has been seen, and drops boilerplate pages recognised by
+# a cheap fingerprint: character count plus a hash of the first few lines.
+# Known fingerprints are read from the file named by OAPO_BOILERPLATE (one
+# per line, # comments); `python extract.py doc.pdf` prints them for each
+# page of a document.
+
+FINGERPRINT_LINES = 5
+
+
+def page_fingerprint(text, lines=FINGERPRINT_LINES):
+    head = []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            head.append(line)
+            if len(head) == lines:
+                break
+    digest = hashlib.sha1("\n".join(head).encode('utf-8')).hexdigest()[:16]
+    return f"{len(text)}:{digest}"
+
+
+def load_boilerplate(path):
+    with open(path, encoding='utf-8') as fh:
+        return frozenset(line.split('#', 1)[0].strip() for line in fh) - {''}
+
+
+BOILERPLATE = load_boilerplate(os.environ["OAPO_BOILERPLATE"]) if os.environ.get("OAPO_BOILERPLATE") else frozenset()
+
+
+def select_pages(pages, stop=None, boilerplate=None, stats=None):
+    # Once closed or exhausted, stats['skipped_pages'] holds the pages that
+    # never reached the caller: boilerplate plus, when iter_pages filled in
+    # 'pages_total', those left unread after the footer.
+    boilerplate = BOILERPLATE if boilerplate is None else boilerplate
+    stats       = {} if stats is None else stats
+    read = dropped = 0
+    try:
+        for text in pages:
+            read += 1
+            if boilerplate and page_fingerprint(text) in boilerplate:
+                dropped += 1
+                continue
+            yield text
+            if stop is not None and stop(text):
+                break
+    finally:
+        if hasattr(pages, 'close'):
+            pages.close()  # stops extraction of pages nobody will read
+        skipped = dropped + max(stats.get('pages_total', read) - read, 0)
+        stats['skipped_pages'] = skipped
+        perf.count('skipped_pages', skipped)
+
+
+def extract_pages(file, workers=None, stop=None, boilerplate=(), stats=None, sandbox=None):
+    # every page by default; boilerplate=None applies the OAPO_BOILERPLATE set
+    stats = {} if stats is None else stats
+    return list(select_pages(iter_pages(file, workers, stats, sandbox), stop, boilerplate, stats))
+
+
+def extract_text(file, workers=None, stop=None, boilerplate=(), stats=None, sandbox=None):
+    return "\n".join(extract_pages(file, workers, stop, boilerplate, stats, sandbox))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Print per-page fingerprints for a boilerplate list")
+    ap.add_argument('pdf', nargs='+', help="one output line per page: fingerprint  # file:page first line")
+    args = ap.parse_args(argv)
+    for path in args.pdf:
+        for n, text in enumerate(iter_pages(path, workers=1), 1):
+            first = next((l.strip() for l in text.splitlines() if l.strip()), '')
+            print(f"{page_fingerprint(text)}  # {os.path.basename(path)}:{n} {first[:60]}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import contextlib
+import hashlib
+import io
+import itertools
+import mmap
+import multiprocessing
+import os
+
+import pdfplumber
+
+# ── PDF ingestion ──
+# A PdfSource holds one read-only buffer per document: files on disk are
+# memory-mapped, bytes and BytesIO uploads are viewed in place. Hashing,
+# pdfplumber and extraction workers all read from that buffer, so a document
+# sits in memory once no matter how many stages touch it.
+#
+# Workers get a small picklable handle instead of the bytes: the path when
+# there is one, otherwise a token for the buffer, which forked workers
+# inherit from the parent. Only non-fork start methods fall back to
+# shipping a copy.
+
+_INHERITED = {}
+_tokens    = itertools.count()
+
+
+class _BufferReader(io.RawIOBase):
+    # seekable binary file over a memoryview; a read copies only what it returns
+
+    def __init__(self, view):
+        self._view = view
+        self._pos  = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def read(self, size=-1):
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos:end].tobytes()
+        self._pos = max(self._pos, end)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+class PdfSource:
+    def __init__(self, view, path=None, owner=None):
+        self.view    = view    # read-only memoryview over the whole PDF
+        self.path    = path
+        self._owner  = owner   # the mmap behind view, if any
+        self._sha256 = None
+
+    @classmethod
+    def of(cls, obj):
+        # paths, bytes-likes, BytesIO (incl. Streamlit uploads) and other file-likes
+        if isinstance(obj, PdfSource):
+            return obj
+        if isinstance(obj, (str, os.PathLike)):
+            return cls.from_path(obj)
+        if isinstance(obj, (bytes, bytearray, memoryview)):
+            return cls(memoryview(obj).cast('B').toreadonly())
+        if hasattr(obj, 'getvalue'):
+            # BytesIO.getvalue() hands back its buffer without copying
+            return cls(memoryview(obj.getvalue()).toreadonly())
+        if hasattr(obj, 'fileno'):
+            try:
+                return cls._mapped(obj, getattr(obj, 'name', None))
+            except (OSError, ValueError, io.UnsupportedOperation):
+                pass
+        if hasattr(obj, 'seek'):
+            obj.seek(0)
+        return cls(memoryview(obj.read()).toreadonly())
+
+    @classmethod
+    def from_path(cls, path):
+        with open(path, 'rb') as fh:
+            return cls._mapped(fh, os.fspath(path))
+
+    @classmethod
+    def _mapped(cls, fh, path):
+        if os.fstat(fh.fileno()).st_size == 0:
+            return cls(memoryview(b''), path=path)
+        mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        path = path if isinstance(path, (str, os.PathLike)) else None
+        return cls(memoryview(mm), path=path, owner=mm)
+
+    @classmethod
+    def attach(cls, handle):
+        # inside a worker: the source a handle from shared() stands for
+        kind, value = handle
+        if kind == 'path':
+            return cls.from_path(value)
+        if kind == 'inherited':
+            return cls(_INHERITED[value])
+        return cls(memoryview(value).toreadonly())
+
+    def __len__(self):
+        return len(self.view)
+
+    def sha256(self):
+        if self._sha256 is None:
+            self._sha256 = hashlib.sha256(self.view).hexdigest()
+        return self._sha256
+
+    def reader(self):
+        # independent position per reader, so several may be open at once
+        return _BufferReader(self.view)
+
+    def open(self):
+        return pdfplumber.open(self.reader())
+
+    @contextlib.contextmanager
+    def shared(self):
+        # picklable handle for process-pool workers, valid inside the block
+        if self.path is not None:
+            yield ('path', os.fspath(self.path))
+        elif multiprocessing.get_start_method() == 'fork':
+            token = next(_tokens)
+            _INHERITED[token] = self.view
+            try:
+                yield ('inherited', token)
+            finally:
+                _INHERITED.pop(token, None)
+        else:
+            yield ('bytes', self.view.tobytes())
+
+    def close(self):
+        if self._owner is not None:
+            try:
+                self.view.release()
+                self._owner.close()
+            except BufferError:
+                pass  # a reader still holds the map; it is freed with the last one
+            self._owner = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
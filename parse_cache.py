@@ -0,0 +1,151 @@
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+import perf
+from ingest import PdfSource
+from parser import PARSER_VERSION, is_complete
+
+log = logging.getLogger(__name__)
+
+# ── Parse cache ──
+# Parsed DataFrames keyed by SHA-256 of the uploaded bytes + parser version.
+# Bytes are wrapped in a PdfSource, which hashes once and is then handed to
+# the parser as-is, so no second copy of the upload is made.
+# Tier 1 is an in-memory LRU; tier 2 (optional) is a directory of pickles
+# trimmed oldest-first once it grows past disk_max_bytes. Partial parses
+# (see parser.is_complete) stay in memory only, and only for partial_ttl
+# seconds: long enough to serve the reruns of one upload, after which a
+# page timeout caused by load is tried again.
+# Cached frames are handed to every caller as-is, so they're read-only:
+# nothing downstream (the comparer included) writes to its inputs.
+
+
+def content_key(data, kind):
+    return f"{kind}-{PdfSource.of(data).sha256()}-v{PARSER_VERSION}"
+
+
+class ParseCache:
+    def __init__(self, max_items=32, disk_dir=None, disk_max_bytes=256 * 1024 * 1024, partial_ttl=60.0):
+        self.max_items      = max_items
+        self.disk_dir       = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self.partial_ttl    = partial_ttl
+        self._mem     = OrderedDict()
+        self._expires = {}  # key -> time.monotonic() deadline, partial parses only
+        self._lock    = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get_or_parse(self, kind, data, parse_fn):
+        source = PdfSource.of(data)
+        key    = content_key(source, kind)
+        df     = self._get(key)
+        if df is None:
+            perf.count('cache_misses')
+            df = parse_fn(source)
+            self._put(key, df)
+        else:
+            perf.count('cache_hits')
+        return df
+
+    def clear(self):
+        with self._lock:
+            self._mem.clear()
+            self._expires.clear()
+
+    # memory tier
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._expires and time.monotonic() >= self._expires[key]:
+                del self._mem[key], self._expires[key]
+            df = self._mem.get(key)
+            if df is not None:
+                self._mem.move_to_end(key)
+                return df
+        df = self._disk_get(key)
+        if df is not None:
+            self._mem_put(key, df)
+        return df
+
+    def _put(self, key, df):
+        if is_complete(df):
+            self._mem_put(key, df)
+            self._disk_put(key, df)
+        else:
+            self._mem_put(key, df, expires=time.monotonic() + self.partial_ttl)
+
+    def _mem_put(self, key, df, expires=None):
+        with self._lock:
+            self._mem[key] = df
+            self._mem.move_to_end(key)
+            if expires is None:
+                self._expires.pop(key, None)
+            else:
+                self._expires[key] = expires
+            while len(self._mem) > self.max_items:
+                old, _ = self._mem.popitem(last=False)
+                self._expires.pop(old, None)
+
+    # disk tier
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, key + ".pkl")
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fh:
+                df = pickle.load(fh)
+            os.utime(path)  # mark as recently used for eviction
+            return df
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # truncated, or written by a build whose classes no longer load:
+            # a miss, and the entry goes so the fresh parse replaces it
+            log.warning("dropping unreadable parse cache entry %s: %s: %s", path, type(e).__name__, e)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+    def _disk_put(self, key, df):
+        if not self.disk_dir:
+            return
+        path = self._path(key)
+        tmp  = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, 'wb') as fh:
+                pickle.dump(df, fh, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except OSError:
+            return
+        self._disk_evict()
+
+    def _disk_evict(self):
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".pkl"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+                total -= size
+            except OSError:
+                pass
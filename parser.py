@@ -1,375 +1,818 @@
-import pdfplumber
+import os
 import pandas as pd
 import re
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from dataclasses import dataclass, fields
+from itertools import chain, islice
+from operator import attrgetter
+
+import perf
+from extract import extract_pages, iter_pages, select_pages
+
+# Bump whenever a change alters parse output, so cached results keyed on it
+# (see parse_cache.py) are not reused across versions.
+PARSER_VERSION = "5"
+
+# ── Compiled pattern registry ──
+# Every pattern used by parse_po / parse_oa is compiled once here so the
+# per-block and per-line loops never go through the re module's cache.
+# OCR noise can put thousands of characters on one line, so runs a pattern
+# may rescan from every offset are fenced off with lookbehinds, possessive
+# quantifiers and atomic groups (Python 3.11+); these leave what matches
+# unchanged (tests/test_patterns.py compares them with the originals), and
+# `python benchmark.py backtrack` times each one on such lines.
+
+# PO document-level
+RE_PO_ORDER_TOTAL  = re.compile(r'Order total(?>.*?\$?USD).*?(?<![\d,])([\d,]++\.\d{2})', re.IGNORECASE)
+RE_PO_GST          = re.compile(r'SPARTAN.*?GST#.*', re.IGNORECASE)
+RE_PO_LINE_START   = re.compile(r'0*\d{4,5}')
+
+# PO per-block
+RE_PO_MODEL        = re.compile(r'([A-Z0-9\-_]{6,})')
+RE_PO_SHIP_DATE    = re.compile(r'([A-Za-z]{3} \d{1,2}, \d{4})')
+RE_PO_QTY_PRICE    = re.compile(r'(?<!\d)(\d++)\s+EA\s+([\d,]++\.\d{2})\s+([\d,]++\.\d{2})')
+RE_TAG_HEADER      = re.compile(r'\bTag(?:s)?\b', re.IGNORECASE)
+RE_SOLD_TO         = re.compile(r'\bSold To\b', re.IGNORECASE)
+RE_SLASH_TAG       = re.compile(r'\b[A-Z0-9\-_]+\s*/\s*[A-Z0-9\-]+(?:-NC)?\b', re.IGNORECASE)
+RE_SLASH_SPACING   = re.compile(r'(?<!\s)\s*/\s*')
+RE_TAG_RUN_BACK    = re.compile(r'(\s*)([A-Z0-9\-_]*)', re.IGNORECASE)  # on reversed text
+RE_WORD_EDGE       = re.compile(r'\b')
+RE_PO_TAG          = re.compile(r'\b[A-Z0-9]{2,}-[A-Z0-9\-]{2,}\b')
+RE_TAG_DATE        = re.compile(
+    r'\b\d{1,2}[-/](?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[-/]\d{4}\b',
+    re.IGNORECASE
+)
+RE_ALL_DIGITS      = re.compile(r'[\d\-]+')
+RE_LETTER          = re.compile(r'[A-Z]')
+RE_DIGIT           = re.compile(r'\d')
+RE_ADDITIONAL_INFO = re.compile(r'Additional Information', re.IGNORECASE)
+RE_CALIB_STOP      = re.compile(r'\bTag(?:s)?\b|Sold To|Ship To', re.IGNORECASE)
+RE_WIRE_RTD        = re.compile(r'(\d)-wire\s*RTD', re.IGNORECASE)
+RE_PO_CALIB_RANGE  = re.compile(r'(-?(?<!\d)\d++(?:\.\d++)?)\s*to\s*(-?\d+(?:\.\d+)?)(?:\s*([A-Za-z°\sCFK%/]+))?')
+RE_PO_UNIT         = re.compile(r'(DEG\s*[CFK]?|°[CFK]?|KPA|PSI|BAR|MBAR)')
+RE_WIRE_COUNT      = re.compile(r'(\d)-wire', re.IGNORECASE)
+
+# OA document-level
+RE_OA_CUST_PO      = re.compile(r'Customer PO(?: No)?\s*:\s*([A-Z0-9\-]+)', re.IGNORECASE)
+RE_OA_TARIFF       = re.compile(
+    r'\s*\d+\.\d+\s+([A-Z0-9\-]*TARIFF[A-Z0-9\-]*)\s+(\d+)\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})',
+    re.IGNORECASE
+)
+RE_OA_ORDER_TOTAL  = re.compile(r'Total(?>.*?\(USD\)).*?(?<![\d,])([\d,]++\.\d{2})', re.IGNORECASE)
+RE_OA_LINE_SPLIT   = re.compile(r'\n(\d{5}(?:/\d{5})*)')
+
+# OA per-block
+RE_HYPHEN_BREAK    = re.compile(r'-\s*\n\s*')
+RE_OA_MODEL        = re.compile(r'\b(?=[A-Z0-9\-_]*[A-Z])[A-Z0-9\-_]{6,}\b')
+RE_OA_MODEL_RUN    = re.compile(r'[A-Z0-9\-_]{6,}')  # runs long enough to hold a model
+RE_OA_EXPECTED_SHIP= re.compile(r'Expected Ship Date:\s*(\d{2}-[A-Za-z]{3}-\d{4})')
+RE_OA_SHIP_DATE    = re.compile(r'([A-Za-z]{3}\s+\d{1,2},\s+\d{4})')
+RE_OA_QTY_PRICE    = re.compile(r'(^|\s)(\d+)\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})')
+RE_OA_TAG_LABEL    = re.compile(r'^(NAME|WIRE|PERM)[:\s]*$')
+RE_OA_COMPOUND_TAG = re.compile(r'[A-Z0-9\-_]+/[A-Z0-9\-_]+(-NC)?')
+RE_OA_TAG          = re.compile(r'[A-Z0-9\-_]{5,}')
+RE_OA_CALIB_RANGE  = re.compile(r'-?(?<!\d)\d++(?:\.\d++)?\s*to\s*-?\d+(?:\.\d+)?')
+RE_OA_UNIT         = re.compile(r'(DEG\s*[CFK]?|°C|°F|KPA|PSI|BAR|MBAR)')
+RE_OA_WIRE_CODE    = re.compile(r'1[2-5]')
+RE_OA_WIRE_INLINE  = re.compile(r'\s1([2-5])\s')
+
+PATTERNS = {name: pat for name, pat in globals().items() if name.startswith('RE_')}
+
+COLUMNS = ['Line No', 'Model Number', 'Ship Date', 'Qty', 'Unit Price', 'Total Price',
+           'Has Tag?', 'Tags', 'Wire-on Tag', 'Calib Data?', 'Calib Details']
+
+# prices as integer cents (nullable), next to the printed strings above
+PRICE_COLUMNS = ['Unit Cents', 'Total Cents']
+# the line's tags as a frozenset of interned strings, for set comparisons
+TAG_SET_COLUMN = 'Tag Set'
+FRAME_COLUMNS = COLUMNS + PRICE_COLUMNS + [TAG_SET_COLUMN]
+
+# Per-line sections a caller can leave out, e.g. parse_po(f, skip=('tags',))
+# for a price or date audit. Skipped columns stay blank and df.attrs['skipped']
+# names them, so compare_oa_po leaves their checks out as well.
+OPTIONAL_SECTIONS = ('tags', 'calibration')
+
+
+def is_complete(df):
+    # a full parse: no section skipped and no page lost to the extraction
+    # sandbox (df.attrs['page_failures']); only these are cached or stored
+    return not (df.attrs.get('skipped') or df.attrs.get('page_failures'))
+
+
+# ── Line-item records ──
+# Both parsers collect one LineItem per row and build the DataFrame once, a
+# column at a time, in items_frame. Document-level values (order total, OA
+# customer PO) ride along in df.attrs instead of as extra rows.
+
+@dataclass(slots=True)
+class LineItem:
+    line_no:       object        # int on the PO, "00010" on the OA, '' for tariff rows
+    model:         str
+    ship_date:     str = ''
+    qty:           str = ''
+    unit_price:    str = ''
+    total_price:   str = ''
+    has_tag:       str = ''
+    tags:          str = ''
+    wire_on_tag:   str = ''
+    calib_data:    str = ''
+    calib_details: str = ''
+    unit_cents:    object = None
+    total_cents:   object = None
+    tag_set:       frozenset = frozenset()
+
+    def __reduce__(self):
+        # pickle as the bare field tuple; pool workers send back thousands
+        return LineItem, _item_values(self)
+
+
+# LineItem fields line up one-to-one with FRAME_COLUMNS
+_item_values = attrgetter(*(f.name for f in fields(LineItem)))
+
+
+def to_cents(amount):
+    # "1,234.50" -> 123450. The price patterns only capture d,ddd.dd amounts,
+    # so dropping the separators is exact; anything else comes back None.
+    try:
+        return int(amount.replace(',', '').replace('.', '')) if amount else None
+    except ValueError:
+        return None
+
+
+def tag_set(tags):
+    # interned, so equal tags across lines and documents share one object
+    return frozenset(map(sys.intern, tags))
+
+
+def skipped_sections(skip):
+    # validated, in OPTIONAL_SECTIONS order
+    unknown = set(skip) - set(OPTIONAL_SECTIONS)
+    if unknown:
+        raise ValueError(f"unknown section(s) {sorted(unknown)}; optional sections are {OPTIONAL_SECTIONS}")
+    return tuple(s for s in OPTIONAL_SECTIONS if s in skip)
+
+
+def _line_sort_key(item):
+    ln = item.line_no
+    if isinstance(ln, int):
+        return ln
+    return int(ln) if ln.isdigit() else float('inf')
+
+
+def items_frame(items, **attrs):
+    # rows ordered by line number; rows without one (tariffs) go last
+    items = sorted(items, key=_line_sort_key)
+    cols  = list(zip(*map(_item_values, items))) if items else [()] * len(FRAME_COLUMNS)
+    df = pd.DataFrame({
+        name: pd.array(vals, dtype='Int64') if name in PRICE_COLUMNS else list(vals)
+        for name, vals in zip(FRAME_COLUMNS, cols)
+    })
+    if not items:
+        # pandas types empty lists as float64, which .str refuses
+        df = df.astype({name: object for name in FRAME_COLUMNS if name not in PRICE_COLUMNS})
+    df.attrs.update(attrs)
+    if 'order_total' in attrs:
+        df.attrs['order_total_cents'] = to_cents(attrs['order_total'])
+    return df
 
-def parse_po(file):
-    data = []
-    order_total = ""
 
-    with pdfplumber.open(file) as pdf:
-        text = "\n".join(p.extract_text() or "" for p in pdf.pages)
-
-    # extract order total
-    stop_match = re.search(r'Order total.*?\$?USD.*?([\d,]+\.\d{2})', text, re.IGNORECASE)
-    if stop_match:
-        order_total = stop_match.group(1).strip()
-
-    # truncate after GST or order total marker
-    gst_match = re.search(r'SPARTAN.*?GST#.*', text, re.IGNORECASE)
-    if gst_match:
-        pos = text.lower().find(gst_match.group(0).lower()) + len(gst_match.group(0))
-        text = text[:pos]
-    elif stop_match:
-        text = text.split(stop_match.group(0))[0]
-
-    # split into line‐item blocks by PO line number
-    blocks = re.split(r'\n(0*\d{4,5})', text)
-
-    for i in range(1, len(blocks) - 1, 2):
-        raw_ln = blocks[i].strip()
-        block  = blocks[i + 1]
-        if not raw_ln.isdigit():
+def parse_po(file, workers=None, skip=(), block_workers=None, boilerplate=None, sandbox=None):
+    stats, meta = {}, {}
+    pages = select_pages(iter_pages(file, workers, stats, sandbox), po_page_stop(), boilerplate, stats)
+    with closing(pages):
+        items = list(iter_po_records(perf.timed_iter('po.extract', pages, 'pages'), meta, skip, block_workers))
+    # closing the pages settles the count of pages never extracted
+    meta['skipped_pages'] = stats['skipped_pages']
+    if stats.get('page_failures'):
+        meta['page_failures'] = stats['page_failures']
+    return po_frame(items, meta)
+
+
+def parse_po_text(text, skip=(), block_workers=None):
+    meta = {}
+    return po_frame(iter_po_records([text], meta, skip, block_workers), meta)
+
+
+# ── Page selection ──
+# Stop conditions for extract.select_pages: extraction ends with the page
+# where the parser would stop reading. A PO ends once both its order total
+# and the SPARTAN … GST# line have been seen (iter_po_blocks breaks there
+# too). An OA has no such stop: tariff rows and the last Customer PO are
+# looked up in the whole text, and either can sit past the total ("Subtotal
+# (USD)" reads as one too), so every page is read; only known boilerplate
+# pages are dropped.
+
+def po_page_stop():
+    seen = {'total': False, 'gst': False}
+
+    def stop(page):
+        low = _lowered(page)
+        seen['total'] = seen['total'] or bool(_line_search(RE_PO_ORDER_TOTAL, page, low, 'order total', anchored=True))
+        seen['gst']   = seen['gst'] or bool(_line_search(RE_PO_GST, page, low, 'spartan', anchored=True))
+        return seen['total'] and seen['gst']
+    return stop
+
+
+PAGE_STOPS = {'po': po_page_stop, 'oa': lambda: None}
+
+
+# ── Text index ──
+# Document-level fields (order totals, footers, tariff rows, customer PO) are
+# found without a regex pass over every line: str.find on a lowercased copy
+# picks out the few lines that contain a pattern's literal, and only those
+# lines are searched. Block starts come from one regex scan per chunk, and
+# blocks are cut from the text as slices.
+
+def _lowered(text):
+    # lowercase copy with the same offsets, or None when IGNORECASE would
+    # match something str.lower() doesn't line up with (the non-ASCII
+    # letters re folds onto i, k and s, or a length-changing lowercase)
+    if text.isascii():
+        return text.lower()
+    if any(c in text for c in '\u0130\u0131\u017f\u212a'):
+        return None
+    low = text.lower()
+    return low if len(low) == len(text) else None
+
+
+def _line_bounds(text, pos):
+    start = text.rfind('\n', 0, pos) + 1
+    end   = text.find('\n', pos)
+    return start, len(text) if end < 0 else end
+
+
+def _line_search(pattern, text, low, needle, anchored=False):
+    # first match of a pattern that can't cross a newline, looking only at
+    # lines containing needle (a lowercase literal every match includes).
+    # anchored: every match starts with needle and whatever follows a later
+    # needle also follows the first, so only the first one per line is tried
+    if low is None:
+        return pattern.search(text)
+    pos = low.find(needle)
+    while pos >= 0:
+        start, end = _line_bounds(text, pos)
+        m = pattern.match(text, pos, end) if anchored else pattern.search(text, start, end)
+        if m:
+            return m
+        pos = low.find(needle, end)
+    return None
+
+
+def _line_matches(pattern, text, low, needle):
+    # pattern.match at the start of every line containing needle, in order
+    if low is None:
+        yield from filter(None, map(pattern.match, text.split('\n')))
+        return
+    pos = low.find(needle)
+    while pos >= 0:
+        start, end = _line_bounds(text, pos)
+        m = pattern.match(text, start, end)
+        if m:
+            yield m
+        pos = low.find(needle, end)
+
+
+def _last_group(pattern, text, low, needle):
+    # group 1 of the last match, for a pattern that starts with needle
+    if low is None:
+        found = pattern.findall(text)
+        return found[-1] if found else None
+    pos = low.rfind(needle)
+    while pos >= 0:
+        m = pattern.match(text, pos)
+        if m:
+            return m.group(1)
+        pos = low.rfind(needle, 0, pos)
+    return None
+
+
+def _slash_tags(text):
+    # RE_SLASH_TAG.findall(text) with one attempt per slash: every match holds
+    # exactly one '/', and the first word boundary in the tag run before it
+    # (or after the previous match) is the only start that can succeed, so a
+    # long run isn't rescanned from each of its boundaries
+    if '/' not in text:
+        return []
+    back  = text[::-1]
+    found = []
+    pos   = 0
+    s     = text.find('/')
+    while s >= 0:
+        ws, run = RE_TAG_RUN_BACK.match(back, len(text) - s).groups()
+        run_end = s - len(ws)
+        lo      = max(run_end - len(run), pos)
+        edge    = RE_WORD_EDGE.search(text, lo, run_end) if lo < run_end else None
+        m       = RE_SLASH_TAG.match(text, edge.start()) if edge and edge.start() < run_end else None
+        if m:
+            found.append(m.group())
+            pos = m.end()
+        s = text.find('/', max(s + 1, pos))
+    return found
+
+
+def _oa_model(block):
+    # RE_OA_MODEL.search(block) with one attempt per run of model characters:
+    # a later start in a run sees less of it, so if the run's first word
+    # boundary fails the rest do too (a letterless run of digits and hyphens
+    # was rescanned from every one of them)
+    for run in RE_OA_MODEL_RUN.finditer(block):
+        edge = RE_WORD_EDGE.search(block, run.start(), run.end())
+        if edge and edge.start() < run.end():
+            m = RE_OA_MODEL.match(block, edge.start())
+            if m:
+                return m
+    return None
+
+
+def _block_spans(split_pattern, text, end):
+    # (line number, start, stop) of each block re.split(split_pattern,
+    # text[:end]) would give, without building the strings
+    spans, prev = [], None
+    for m in split_pattern.finditer(text, 0, end):
+        if prev:
+            spans.append((prev[0], prev[1], m.start()))
+        prev = (m.group(1), m.end())
+    if prev:
+        spans.append((prev[0], prev[1], end))
+    return spans
+
+
+class _BlockSplitter:
+    # Cuts a stream of text into (line number, block text) pairs the same way
+    # re.split(r'\n(<line_start>)', text) would on the joined text. Text comes
+    # in chunks of whole lines (a page or part of one); a block running over
+    # a chunk boundary is joined back up with a newline.
+
+    def __init__(self, line_start):
+        self.line_start = line_start
+        self.next_start = re.compile(r'\n(?:%s)' % line_start.pattern, line_start.flags)
+        self.raw_ln     = None
+        self.pieces     = []
+        self.first      = True
+
+    def feed(self, chunk):
+        # yields the blocks this chunk closes
+        pos = 0
+        m   = None if self.first else self.line_start.match(chunk)
+        self.first = False
+        if m:
+            closed = self.close()
+            if closed:
+                yield closed
+            self.raw_ln, pos = m.group(0), m.end()
+        for m in self.next_start.finditer(chunk, pos):
+            if self.raw_ln is not None:
+                self.pieces.append(chunk[pos:m.start()])
+                yield self.close()
+            self.raw_ln, pos = m.group(0)[1:], m.end()
+        if self.raw_ln is not None:
+            self.pieces.append(chunk[pos:])
+
+    def close(self):
+        if self.raw_ln is None:
+            return None
+        closed = (self.raw_ln, "\n".join(self.pieces))
+        self.raw_ln, self.pieces = None, []
+        return closed
+
+
+# ── Parallel block parsing ──
+# Blocks are independent once split, so with block_workers > 1 a long
+# document's blocks go to a process pool in chunks of BLOCK_CHUNK (one
+# pickle round trip per chunk, not per block). Results come back in block
+# order, so the frame is identical to a serial parse. Documents with fewer
+# than PARALLEL_MIN_BLOCKS blocks stay serial: the pool would cost more
+# than it saves.
+
+DEFAULT_BLOCK_WORKERS = int(os.environ.get("OAPO_PARSE_WORKERS", "1"))
+PARALLEL_MIN_BLOCKS   = 2000
+BLOCK_CHUNK           = 250
+
+
+def _parse_chunk(fn, chunk, skip):
+    return [fn(raw_ln, block, skip) for raw_ln, block in chunk]
+
+
+def map_blocks(fn, blocks, skip=(), workers=None):
+    # fn(raw_ln, block, skip) for each (raw_ln, block), lazily and in order
+    workers = DEFAULT_BLOCK_WORKERS if workers is None else workers
+    blocks  = iter(blocks)
+    head    = list(islice(blocks, PARALLEL_MIN_BLOCKS)) if workers > 1 else []
+    if len(head) < PARALLEL_MIN_BLOCKS:
+        for raw_ln, block in chain(head, blocks):
+            yield fn(raw_ln, block, skip)
+        return
+
+    pool    = ProcessPoolExecutor(max_workers=workers)
+    pending = deque()
+    rest    = chain(head, blocks)
+    try:
+        with perf.span('parse.pool') as sp:
+            while True:
+                chunk = list(islice(rest, BLOCK_CHUNK))
+                if not chunk:
+                    break
+                pending.append(pool.submit(_parse_chunk, fn, chunk, skip))
+                sp.count('chunks')
+                # keep a few chunks queued per worker, not the whole document
+                while len(pending) > 2 * workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def iter_po_records(pages, meta=None, skip=(), workers=None):
+    # Yields PO LineItems in block order; workers > 1 parses the blocks of
+    # a long document in a process pool (see map_blocks).
+    skip = skipped_sections(skip)
+    for rec in map_blocks(_po_block_record, iter_po_blocks(pages, meta), skip, workers):
+        # same filters the DataFrame used to apply after the fact
+        if rec is None or rec.line_no > 10000:
             continue
-        ln = int(raw_ln)
-        if ln <= 0:
+        if not (rec.qty.strip() and rec.unit_price.strip() and rec.total_price.strip()):
             continue
+        yield rec
+    if meta is not None and skip:
+        meta['skipped'] = skip
+
+
+def iter_po_blocks(pages, meta=None):
+    # Yields (line number, block text) as soon as a block closes, holding only
+    # the current page and the open block. The document ends after the
+    # SPARTAN … GST# line, or failing that just before the Order total. Text
+    # after an Order total is held until we know whether a GST line follows.
+    # Once exhausted, meta['order_total'] holds the order total ('' if none).
+    splitter    = _BlockSplitter(RE_PO_LINE_START)
+    order_total = ""
+    held        = None   # (order-total line prefix, chunks since the order total)
+    footer_done = False
+
+    def closed_blocks(chunk):
+        for closed in splitter.feed(chunk):
+            perf.count('blocks')
+            yield closed
+
+    for page in pages:
+        with perf.span('po.split'):
+            low = _lowered(page)
+            tot = None
+            if not order_total:
+                tot = _line_search(RE_PO_ORDER_TOTAL, page, low, 'order total', anchored=True)
+                if tot:
+                    order_total = tot.group(1).strip()
+            if footer_done:
+                if order_total:
+                    break
+                continue
 
+            gst = _line_search(RE_PO_GST, page, low, 'spartan', anchored=True)
+            if gst:
+                # the document runs through the GST line, any total above it included
+                for chunk in (held[1] if held else []):
+                    yield from closed_blocks(chunk)
+                held = None
+                yield from closed_blocks(page[:_line_bounds(page, gst.start())[1]])
+                footer_done = True
+            elif held is not None:
+                held[1].append(page)
+            elif tot:
+                start = _line_bounds(page, tot.start())[0]
+                if start:
+                    yield from closed_blocks(page[:start - 1])
+                held = (page[start:tot.start()], [page[start:]])
+            else:
+                yield from closed_blocks(page)
+        if footer_done and order_total:
+            break
+
+    if held is not None:
+        yield from closed_blocks(held[0])
+    closed = splitter.close()
+    if closed:
+        perf.count('blocks')
+        yield closed
+
+    if meta is not None:
+        meta['order_total'] = order_total
+
+
+def po_frame(records, meta):
+    items = list(records)  # drains the generator, which fills in meta
+    with perf.span('po.frame'):
+        return items_frame(items, **meta)
+
+
+def _po_block_record(raw_ln, block, skip=()):
+    raw_ln = raw_ln.strip()
+    if not raw_ln.isdigit():
+        return None
+    ln = int(raw_ln)
+    if ln <= 0:
+        return None
+
+    with perf.span('po.fields'):
         # Model Number
-        model_m   = re.search(r'([A-Z0-9\-_]{6,})', block)
+        model_m   = RE_PO_MODEL.search(block)
         model_str = model_m.group(1) if model_m else ''
 
         # Ship Date
-        ship_date_m = re.search(r'([A-Za-z]{3} \d{1,2}, \d{4})', block)
+        ship_date_m = RE_PO_SHIP_DATE.search(block)
         ship_date   = ship_date_m.group(1) if ship_date_m else ''
 
         # Qty / Unit Price / Total Price
         qty = unit_price = total_price = ""
-        m = re.search(r'(\d+)\s+EA\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})', block)
+        m = RE_PO_QTY_PRICE.search(block)
         if m:
             qty, unit_price, total_price = m.group(1), m.group(2), m.group(3)
 
-        # TAG section (unchanged except date regex)
-        tag_section = ""
-        tag_hdr     = re.search(r'\bTag(?:s)?\b', block, re.IGNORECASE)
-        sold_to     = re.search(r'\bSold To\b', block, re.IGNORECASE)
-        if tag_hdr:
-            start = tag_hdr.end()
-            end   = sold_to.start() if sold_to else len(block)
-            tag_section = block[start:end]
-
-        # first grab any slash-combined tags
-        slash_comps = []
-        for raw in re.findall(r'\b[A-Z0-9\-_]+\s*/\s*[A-Z0-9\-]+(?:-NC)?\b', tag_section, re.IGNORECASE):
-            slash_comps.append(re.sub(r'\s*/\s*', '/', raw.upper()))
-
-        comp_parts = {p for comp in slash_comps for p in comp.split('/',1)}
-
-        tags = slash_comps.copy()
-        for raw in re.findall(r'\b[A-Z0-9]{2,}-[A-Z0-9\-]{2,}\b', tag_section):
-            norm = raw.upper()
-            if norm in comp_parts:
-                continue
-
-            # ←──── UPDATED DATE CHECK ────→
-            is_date = bool(re.search(
-                r'\b\d{1,2}[-/](?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[-/]\d{4}\b',
-                norm, re.IGNORECASE
-            ))
-            is_all_digits = bool(re.fullmatch(r'[\d\-]+', norm))
-            has_letter    = bool(re.search(r'[A-Z]', norm))
-            has_digit     = bool(re.search(r'\d', norm))
-
-            if has_letter and has_digit and not is_date and not is_all_digits:
-                tags.append(norm)
-
-        # —— NEW: filter out any "N/A" tags —— 
-        tags = [t for t in tags if t.upper() != "N/A"]
-
-        tags    = list(dict.fromkeys(tags))
-        has_tag = 'Y' if tags else 'N'
+    # optional sections: a skipped one leaves its columns blank
+    tags, has_tag = [], ''
+    if 'tags' not in skip:
+        with perf.span('po.tags') as sp:
+            # TAG section (unchanged except date regex)
+            tag_section = ""
+            tag_hdr     = RE_TAG_HEADER.search(block)
+            sold_to     = RE_SOLD_TO.search(block)
+            if tag_hdr:
+                start = tag_hdr.end()
+                end   = sold_to.start() if sold_to else len(block)
+                tag_section = block[start:end]
+
+            # first grab any slash-combined tags
+            slash_comps = []
+            for raw in _slash_tags(tag_section):
+                slash_comps.append(RE_SLASH_SPACING.sub('/', raw.upper()))
+
+            comp_parts = {p for comp in slash_comps for p in comp.split('/',1)}
+
+            tags = slash_comps.copy()
+            for raw in RE_PO_TAG.findall(tag_section):
+                norm = raw.upper()
+                if norm in comp_parts:
+                    continue
 
-        # ── CALIBRATION SECTION (unchanged) ──
-        calib_parts  = []
-        wire_configs = []
-        block_lines  = [ln.strip() for ln in block.split('\n') if ln.strip()]
+                # ←──── UPDATED DATE CHECK ────→
+                is_date = bool(RE_TAG_DATE.search(norm))
+                is_all_digits = bool(RE_ALL_DIGITS.fullmatch(norm))
+                has_letter    = bool(RE_LETTER.search(norm))
+                has_digit     = bool(RE_DIGIT.search(norm))
+
+                if has_letter and has_digit and not is_date and not is_all_digits:
+                    tags.append(norm)
+
+            # —— NEW: filter out any "N/A" tags —— 
+            tags = [t for t in tags if t.upper() != "N/A"]
+
+            tags    = list(dict.fromkeys(tags))
+            has_tag = 'Y' if tags else 'N'
+
+            sp.count('tags', len(tags))
+
+    calib_data = calib_details = ''
+    if 'calibration' not in skip:
+        with perf.span('po.calibration'):
+            # ── CALIBRATION SECTION (unchanged) ──
+            calib_parts  = []
+            wire_configs = []
+            block_lines  = [ln.strip() for ln in block.split('\n') if ln.strip()]
+
+            add_idx = next(
+                (idx for idx, ln in enumerate(block_lines)
+                 if RE_ADDITIONAL_INFO.search(ln)),
+                None
+            )
+            if add_idx is not None:
+                for offset, ln_text in enumerate(block_lines[add_idx+1:]):
+                    idx_line = add_idx + 1 + offset
+                    if RE_CALIB_STOP.search(ln_text):
+                        break
+                    if '2-wire' in ln_text.lower():
+                        continue
+                    wm = RE_WIRE_RTD.search(ln_text)
+                    if wm:
+                        wire_configs.append(f"{wm.group(1)}-wire RTD")
+                    for mrange in RE_PO_CALIB_RANGE.finditer(ln_text):
+                        start, end, unit_same = mrange.group(1), mrange.group(2), mrange.group(3)
+                        unit = unit_same.strip() if unit_same else ""
+                        if not unit and idx_line+1 < len(block_lines):
+                            um = RE_PO_UNIT.search(block_lines[idx_line+1].upper())
+                            if um:
+                                unit = um.group(0).strip()
+                        calib_parts.append(f"{start} to {end} {unit}".strip())
+
+            if not wire_configs and any('WIRE' in ln.upper() for ln in block_lines):
+                for w in RE_WIRE_COUNT.findall("\n".join(block_lines)):
+                    cfg = f"{w}-wire RTD"
+                    if cfg not in wire_configs:
+                        wire_configs.append(cfg)
+
+            if wire_configs:
+                calib_parts = wire_configs + calib_parts
+
+            calib_parts   = [p for p in calib_parts if p]
+            calib_parts   = list(dict.fromkeys(calib_parts))
+            calib_data    = 'Y' if calib_parts else ''
+            calib_details = ", ".join(calib_parts)
+
+    return LineItem(
+        line_no       = ln,
+        model         = model_str,
+        ship_date     = ship_date,
+        qty           = qty,
+        unit_price    = unit_price,
+        total_price   = total_price,
+        has_tag       = has_tag,
+        tags          = ", ".join(tags),
+        wire_on_tag   = "",
+        calib_data    = calib_data,
+        calib_details = calib_details,
+        unit_cents    = to_cents(unit_price),
+        total_cents   = to_cents(total_price),
+        tag_set       = tag_set(tags),
+    )
 
-        add_idx = next(
-            (idx for idx, ln in enumerate(block_lines)
-             if re.search(r'Additional Information', ln, re.IGNORECASE)),
-            None
-        )
-        if add_idx is not None:
-            for offset, ln_text in enumerate(block_lines[add_idx+1:]):
-                idx_line = add_idx + 1 + offset
-                if re.search(r'\bTag(?:s)?\b|Sold To|Ship To', ln_text, re.IGNORECASE):
-                    break
-                if '2-wire' in ln_text.lower():
-                    continue
-                wm = re.search(r'(\d)-wire\s*RTD', ln_text, re.IGNORECASE)
-                if wm:
-                    wire_configs.append(f"{wm.group(1)}-wire RTD")
-                for mrange in re.finditer(
-                        r'(-?\d+(?:\.\d+)?)\s*to\s*(-?\d+(?:\.\d+)?)(?:\s*([A-Za-z°\sCFK%/]+))?',
-                        ln_text):
-                    start, end, unit_same = mrange.group(1), mrange.group(2), mrange.group(3)
-                    unit = unit_same.strip() if unit_same else ""
-                    if not unit and idx_line+1 < len(block_lines):
-                        um = re.search(
-                            r'(DEG\s*[CFK]?|°[CFK]?|KPA|PSI|BAR|MBAR)',
-                            block_lines[idx_line+1].upper()
-                        )
-                        if um:
-                            unit = um.group(0).strip()
-                    calib_parts.append(f"{start} to {end} {unit}".strip())
-
-        if not wire_configs and any('WIRE' in ln.upper() for ln in block_lines):
-            for w in re.findall(r'(\d)-wire', "\n".join(block_lines), re.IGNORECASE):
-                cfg = f"{w}-wire RTD"
-                if cfg not in wire_configs:
-                    wire_configs.append(cfg)
-
-        if wire_configs:
-            calib_parts = wire_configs + calib_parts
-
-        calib_parts   = [p for p in calib_parts if p]
-        calib_parts   = list(dict.fromkeys(calib_parts))
-        calib_data    = 'Y' if calib_parts else ''
-        calib_details = ", ".join(calib_parts)
-
-        data.append({
-            'Line No':       ln,
-            'Model Number':  model_str,
-            'Ship Date':     ship_date,
-            'Qty':           qty,
-            'Unit Price':    unit_price,
-            'Total Price':   total_price,
-            'Has Tag?':      has_tag,
-            'Tags':          ", ".join(tags),
-            'Wire-on Tag':   "",
-            'Calib Data?':   calib_data,
-            'Calib Details': calib_details
-        })
-
-    # build DataFrame & apply filters (unchanged)
-    df = pd.DataFrame(data)
-    df = df[
-        (pd.to_numeric(df['Line No'], errors='coerce') <= 10000) &
-        (df['Qty'].str.strip() != '') &
-        (df['Unit Price'].str.strip() != '') &
-        (df['Total Price'].str.strip() != '')
-    ].copy()
-
-    if order_total:
-        df = pd.concat([
-            df,
-            pd.DataFrame([{
-                'Line No':       '',
-                'Model Number':  'ORDER TOTAL',
-                'Ship Date':     '',
-                'Qty':           '',
-                'Unit Price':    '',
-                'Total Price':   order_total,
-                'Has Tag?':      '',
-                'Tags':          '',
-                'Wire-on Tag':   '',
-                'Calib Data?':   '',
-                'Calib Details': ''
-            }])
-        ], ignore_index=True)
-
-    df_main = df[df['Model Number'] != 'ORDER TOTAL'].copy()
-    df_total= df[df['Model Number'] == 'ORDER TOTAL'].copy()
-    df_main['Line No'] = pd.to_numeric(df_main['Line No'], errors='coerce')
-    df_main = df_main.sort_values(by='Line No', ignore_index=True)
-    df = pd.concat([df_main, df_total], ignore_index=True)
 
+def parse_oa(file, workers=None, skip=(), block_workers=None, boilerplate=None, sandbox=None):
+    stats = {}
+    with perf.span('oa.extract') as sp:
+        pages = extract_pages(file, workers, None, boilerplate, stats, sandbox)
+        sp.count('pages', len(pages))
+    df = parse_oa_text("\n".join(pages), skip, block_workers)
+    df.attrs['skipped_pages'] = stats['skipped_pages']
+    if stats.get('page_failures'):
+        df.attrs['page_failures'] = stats['page_failures']
     return df
 
-    
-import pdfplumber
-import pandas as pd
-import re
 
-def parse_oa(file):
+def parse_oa_text(text, skip=(), block_workers=None):
+    skip = skipped_sections(skip)
     data = []
     order_total = ""
     tariff_rows = []
 
-    with pdfplumber.open(file) as pdf:
-        text = "\n".join(p.extract_text() or "" for p in pdf.pages)
+    with perf.span('oa.split'):
+        # one index over the text: header field, tariff rows, the order
+        # total that ends the line items, and the block offsets before it
+        low     = _lowered(text)
+        cust_po = _last_group(RE_OA_CUST_PO, text, low, 'customer po')
+        cust_po = cust_po.strip() if cust_po is not None else None
+
+        for m in _line_matches(RE_OA_TARIFF, text, low, 'tariff'):
+            tariff_rows.append(LineItem(
+                line_no     = '',
+                model       = m.group(1),
+                qty         = m.group(2),
+                unit_price  = m.group(3),
+                total_price = m.group(4),
+                unit_cents  = to_cents(m.group(3)),
+                total_cents = to_cents(m.group(4)),
+            ))
 
-    cp_matches = re.findall(r'Customer PO(?: No)?\s*:\s*([A-Z0-9\-]+)', text, re.IGNORECASE)
-    cust_po = cp_matches[-1].strip() if cp_matches else None
+        # the items stop where the first total match starts
+        end        = len(text)
+        stop_match = _line_search(RE_OA_ORDER_TOTAL, text, low, 'total', anchored=True)
+        if stop_match:
+            order_total = stop_match.group(1).strip()
+            end         = stop_match.start()
 
-    for line in text.split('\n'):
-        m = re.match(
-            r'\s*\d+\.\d+\s+([A-Z0-9\-]*TARIFF[A-Z0-9\-]*)\s+(\d+)\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})',
-            line, re.IGNORECASE
-        )
-        if m:
-            tariff_rows.append({
-                'Line No':       '',
-                'Model Number':  m.group(1),
-                'Ship Date':     '',
-                'Qty':           m.group(2),
-                'Unit Price':    m.group(3),
-                'Total Price':   m.group(4),
-                'Has Tag?':      '',
-                'Tags':          '',
-                'Wire-on Tag':   '',
-                'Calib Data?':   '',
-                'Calib Details': ''
-            })
-
-    stop_match = re.search(r'Total.*?\(USD\).*?([\d,]+\.\d{2})', text, re.IGNORECASE)
-    if stop_match:
-        order_total = stop_match.group(1).strip()
-        text = text.split(stop_match.group(0))[0]
-
-    blocks = re.split(r'\n(\d{5}(?:/\d{5})*)', text)
-    for i in range(1, len(blocks) - 1, 2):
-        raw_line_no = blocks[i].strip()
-        block       = blocks[i + 1]
-        block = re.sub(r'-\s*\n\s*', '-', block)
-
-        line_nos = [ln for ln in raw_line_no.split('/')
-                    if ln.isdigit() and 1 <= int(ln) <= 10000]
-        if not line_nos:
-            continue
+        spans = _block_spans(RE_OA_LINE_SPLIT, text, end)
+
+    blocks = ((raw_line_no, text[start:stop]) for raw_line_no, start, stop in spans)
+    for items in map_blocks(_oa_block_items, blocks, skip, block_workers):
+        if items:
+            perf.count('blocks')
+            data.extend(items)
 
-        lines_clean = [l.strip() for l in block.split('\n') if l.strip()]
+    with perf.span('oa.frame'):
+        attrs = {'skipped': skip} if skip else {}
+        return items_frame(data + tariff_rows, order_total=order_total, cust_po=cust_po or '', **attrs)
 
-        model_m   = re.search(r'\b(?=[A-Z0-9\-_]*[A-Z])[A-Z0-9\-_]{6,}\b', block)
+
+def _oa_block_items(raw_line_no, block, skip=()):
+    # one OA block -> a LineItem per line number in its header (none if the
+    # header holds no valid line number)
+    raw_line_no = raw_line_no.strip()
+    block       = RE_HYPHEN_BREAK.sub('-', block)
+
+    line_nos = [ln for ln in raw_line_no.split('/')
+                if ln.isdigit() and 1 <= int(ln) <= 10000]
+    if not line_nos:
+        return []
+
+    # only the optional sections read the block line by line
+    lines_clean = [l.strip() for l in block.split('\n') if l.strip()] if len(skip) < len(OPTIONAL_SECTIONS) else []
+
+    with perf.span('oa.fields'):
+        model_m   = _oa_model(block)
         model     = model_m.group(0) if model_m else ""
 
-        sd        = re.search(r'Expected Ship Date:\s*(\d{2}-[A-Za-z]{3}-\d{4})', block)
+        sd        = RE_OA_EXPECTED_SHIP.search(block)
         ship_date = sd.group(1) if sd else (
-                      (re.search(r'([A-Za-z]{3}\s+\d{1,2},\s+\d{4})', block) or [None, ""])[1]
+                      (RE_OA_SHIP_DATE.search(block) or [None, ""])[1]
                     )
 
         qty = unit_price = total_price = ""
-        m2  = re.search(r'(^|\s)(\d+)\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})', block)
+        m2  = RE_OA_QTY_PRICE.search(block)
         if m2:
             qty, unit_price, total_price = m2.group(2), m2.group(3), m2.group(4)
 
-        # ✅ Final universal tag logic: supports NAME, WIRE, PERM and fallback
-        tags = []
-        wire_on_tags = []
-        qty_int = int(qty) if qty.isdigit() else 1
-
-        # Step 1: Look for a label line (NAME, WIRE, PERM), grab the next line
-        for i in range(len(lines_clean) - 1):
-            label = lines_clean[i].strip().upper()
-            candidate = lines_clean[i+1].strip().upper()
-            if re.match(r'^(NAME|WIRE|PERM)\s*[:\s]*$', label):
-                if '/' in candidate and 'IC' in candidate:
-                    compound = re.sub(r'\s*/\s*', '/', candidate)
-                    if re.fullmatch(r'[A-Z0-9\-_]+/[A-Z0-9\-_]+(-NC)?', compound):
-                        tags.append(compound)
-                        wire_on_tags.append(compound)
-                        break
-                elif re.fullmatch(r'[A-Z0-9\-_]{5,}', candidate):
-                    tags.append(candidate)
-                    wire_on_tags.append(candidate)
-                    break
+    tags, wire_on_tags, has_tag = [], [], ''
+    if 'tags' not in skip:
+        with perf.span('oa.tags') as sp:
+            # ✅ Final universal tag logic: supports NAME, WIRE, PERM and fallback
+            tags = []
+            wire_on_tags = []
+            qty_int = int(qty) if qty.isdigit() else 1
 
-        # Step 2: If nothing found, fallback to lines below WIRE:
-        if not tags:
+            # Step 1: Look for a label line (NAME, WIRE, PERM), grab the next line;
+            # note the first WIRE label on the way for step 2
             wire_idx = None
-            for idx, ln in enumerate(lines_clean):
-                if re.match(r'^WIRE\s*[:\s]*$', ln, re.IGNORECASE):
-                    wire_idx = idx
-                    break
-            if wire_idx is not None:
-                tag_candidates = lines_clean[wire_idx+1:]
-                for line in tag_candidates:
-                    tag_candidate = line.strip().upper()
-                    if re.fullmatch(r'[A-Z0-9\-_]{5,}', tag_candidate):
+            for i in range(len(lines_clean) - 1):
+                label = lines_clean[i].upper()
+                if RE_OA_TAG_LABEL.match(label):
+                    if wire_idx is None and label.startswith('WIRE'):
+                        wire_idx = i
+                    candidate = lines_clean[i+1].upper()
+                    if '/' in candidate and 'IC' in candidate:
+                        compound = RE_SLASH_SPACING.sub('/', candidate)
+                        if RE_OA_COMPOUND_TAG.fullmatch(compound):
+                            tags.append(compound)
+                            wire_on_tags.append(compound)
+                            break
+                    elif RE_OA_TAG.fullmatch(candidate):
+                        tags.append(candidate)
+                        wire_on_tags.append(candidate)
+                        break
+
+            # Step 2: If nothing found, fallback to lines below WIRE:
+            # (a WIRE label on the last line has nothing below it)
+            if not tags and wire_idx is not None:
+                for line in lines_clean[wire_idx+1:]:
+                    tag_candidate = line.upper()
+                    if RE_OA_TAG.fullmatch(tag_candidate):
                         tags.append(tag_candidate)
                         wire_on_tags.append(tag_candidate)
                     if len(tags) >= qty_int:
                         break
 
-        tags = list(dict.fromkeys(tags))
-        wire_on_tags = list(dict.fromkeys(wire_on_tags))
-        has_tag = 'Y' if tags else 'N'
-
-        # 🔬 Calibration logic
-        calib_parts  = []
-        wire_configs = []
-        for idx3, ln3 in enumerate(lines_clean):
-            if re.search(r'-?\d+(?:\.\d+)?\s*to\s*-?\d+(?:\.\d+)?', ln3):
-                ranges    = re.findall(r'-?\d+(?:\.\d+)?\s*to\s*-?\d+(?:\.\d+)?', ln3)
-                unit_clean= ""
-                if idx3+1 < len(lines_clean):
-                    um = re.search(
-                        r'(DEG\s*[CFK]?|°C|°F|KPA|PSI|BAR|MBAR)',
-                        lines_clean[idx3+1].upper()
-                    )
-                    if um:
-                        unit_clean = um.group(0).strip().upper()
-                if idx3+2 < len(lines_clean) and \
-                   re.fullmatch(r'1[2-5]', lines_clean[idx3+2].strip()):
-                    code = lines_clean[idx3+2].strip()[1]
-                    wire_configs.append(f"{code}-wire RTD")
-                for r in ranges:
-                    calib_parts.append(f"{r} {unit_clean}".strip())
-        if not wire_configs and any('WIRE' in ln.upper() for ln in lines_clean):
-            for w in re.findall(r'\s1([2-5])\s', block):
-                wire_configs.append(f"{w}-wire RTD")
-        wire_configs = list(dict.fromkeys(wire_configs))
-        if wire_configs:
-            calib_parts = wire_configs + calib_parts
-        calib_parts   = [p for p in calib_parts if p]
-        calib_parts   = list(dict.fromkeys(calib_parts))
-        calib_data    = 'Y' if calib_parts else 'N'
-        calib_details = ", ".join(calib_parts)
-
-        for line_no in line_nos:
-            data.append({
-                'Line No':       line_no,
-                'Model Number':  model,
-                'Ship Date':     ship_date,
-                'Qty':           qty,
-                'Unit Price':    unit_price,
-                'Total Price':   total_price,
-                'Has Tag?':      has_tag,
-                'Tags':          ", ".join(tags),
-                'Wire-on Tag':   ", ".join(wire_on_tags),
-                'Calib Data?':   calib_data,
-                'Calib Details': calib_details
-            })
-
-    data.extend(tariff_rows)
-
-    df = pd.DataFrame(data)
-    if order_total:
-        df = pd.concat([df, pd.DataFrame([{
-            'Line No':       '',
-            'Model Number':  'ORDER TOTAL',
-            'Ship Date':     '',
-            'Qty':           '',
-            'Unit Price':    '',
-            'Total Price':   order_total,
-            'Has Tag?':      '',
-            'Tags':          '',
-            'Wire-on Tag':   '',
-            'Calib Data?':   '',
-            'Calib Details': ''
-        }])], ignore_index=True)
-
-    df['Tags'] = df['Tags'].apply(
-        lambda s: ", ".join(dict.fromkeys([t.strip() for t in s.split(',') if t.strip()]))
-    )
-
-    df_main  = df[df['Model Number']!='ORDER TOTAL'].copy()
-    df_total = df[df['Model Number']=='ORDER TOTAL'].copy()
-    df_main = df_main.sort_values(
-        by='Line No',
-        key=lambda col: pd.to_numeric(col, errors='coerce'),
-        ignore_index=True
-    )
-    df = pd.concat([df_main, df_total], ignore_index=True)
-    return df
-
-
+            tags = list(dict.fromkeys(tags))
+            wire_on_tags = list(dict.fromkeys(wire_on_tags))
+            has_tag = 'Y' if tags else 'N'
+
+            sp.count('tags', len(tags))
+
+    calib_data = calib_details = ''
+    if 'calibration' not in skip:
+        with perf.span('oa.calibration'):
+            # 🔬 Calibration logic
+            calib_parts  = []
+            wire_configs = []
+            for idx3, ln3 in enumerate(lines_clean):
+                ranges = RE_OA_CALIB_RANGE.findall(ln3)
+                if ranges:
+                    unit_clean= ""
+                    if idx3+1 < len(lines_clean):
+                        um = RE_OA_UNIT.search(lines_clean[idx3+1].upper())
+                        if um:
+                            unit_clean = um.group(0).strip().upper()
+                    if idx3+2 < len(lines_clean) and \
+                       RE_OA_WIRE_CODE.fullmatch(lines_clean[idx3+2].strip()):
+                        code = lines_clean[idx3+2].strip()[1]
+                        wire_configs.append(f"{code}-wire RTD")
+                    for r in ranges:
+                        calib_parts.append(f"{r} {unit_clean}".strip())
+            if not wire_configs and any('WIRE' in ln.upper() for ln in lines_clean):
+                for w in RE_OA_WIRE_INLINE.findall(block):
+                    wire_configs.append(f"{w}-wire RTD")
+            wire_configs = list(dict.fromkeys(wire_configs))
+            if wire_configs:
+                calib_parts = wire_configs + calib_parts
+            calib_parts   = [p for p in calib_parts if p]
+            calib_parts   = list(dict.fromkeys(calib_parts))
+            calib_data    = 'Y' if calib_parts else 'N'
+            calib_details = ", ".join(calib_parts)
+
+    return [
+        LineItem(
+            line_no       = line_no,
+            model         = model,
+            ship_date     = ship_date,
+            qty           = qty,
+            unit_price    = unit_price,
+            total_price   = total_price,
+            has_tag       = has_tag,
+            tags          = ", ".join(tags),
+            wire_on_tag   = ", ".join(wire_on_tags),
+            calib_data    = calib_data,
+            calib_details = calib_details,
+            unit_cents    = to_cents(unit_price),
+            total_cents   = to_cents(total_price),
+            tag_set       = tag_set(tags),
+        )
+        for line_no in line_nos
+    ]
@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+
+import pandas as pd
+
+# ── Stage timing ──
+# perf.span("name") times a stage and perf.count("key", n) bumps a counter on
+# the innermost open span. Nothing is recorded unless a Recorder is active on
+# the current thread (perf.recording() / perf.start()); otherwise span()
+# hands back a shared no-op object, so instrumented code pays one attribute
+# lookup per call.
+
+_local = threading.local()
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def count(self, key, n=1):
+        pass
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ('rec', 'name', 'start', 'child_ns', 'counters')
+
+    def __init__(self, rec, name):
+        self.rec      = rec
+        self.name     = name
+        self.child_ns = 0
+        self.counters = {}
+
+    def __enter__(self):
+        self.rec._stack.append(self)
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        dur = time.perf_counter_ns() - self.start
+        self.rec._close(self, dur)
+        return False
+
+    def count(self, key, n=1):
+        self.counters[key] = self.counters.get(key, 0) + n
+        totals = self.rec.counters
+        totals[key] = totals.get(key, 0) + n
+
+
+class Recorder:
+    def __init__(self):
+        self.events   = []   # finished spans, in completion order
+        self.counters = {}   # counter totals across all spans
+        self._stack   = []
+
+    def _close(self, sp, dur):
+        # generators can leave spans open out of order, so pop by identity
+        stack = self._stack
+        if stack and stack[-1] is sp:
+            stack.pop()
+        elif sp in stack:
+            stack.remove(sp)
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            parent.child_ns += dur
+        self.events.append({
+            'span':     sp.name,
+            'parent':   parent.name if parent is not None else None,
+            'start_ns': sp.start,
+            'dur_ns':   dur,
+            'self_ns':  dur - sp.child_ns,
+            **sp.counters,
+        })
+
+    def count(self, key, n=1):
+        if self._stack:
+            self._stack[-1].count(key, n)
+        else:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def merge(self, other):
+        # fold in a recorder filled on another thread
+        self.events.extend(other.events)
+        for key, val in other.counters.items():
+            self.counters[key] = self.counters.get(key, 0) + val
+
+    def summary(self):
+        rows = {}
+        for ev in self.events:
+            row = rows.setdefault(ev['span'], {'Stage': ev['span'], 'Calls': 0, 'Total ms': 0.0, 'Self ms': 0.0})
+            row['Calls']    += 1
+            row['Total ms'] += ev['dur_ns'] / 1e6
+            row['Self ms']  += ev['self_ns'] / 1e6
+            for key, val in ev.items():
+                if key not in ('span', 'parent', 'start_ns', 'dur_ns', 'self_ns'):
+                    row[key] = row.get(key, 0) + val
+        df = pd.DataFrame(list(rows.values()))
+        if not df.empty:
+            counters = df.columns[4:]
+            df[counters] = df[counters].fillna(0).astype(int)
+            df[['Total ms', 'Self ms']] = df[['Total ms', 'Self ms']].round(2)
+            df = df.sort_values('Self ms', ascending=False, ignore_index=True)
+        return df
+
+    def to_jsonl(self, path, **extra):
+        # one line per span, then a totals line; extra fields (e.g. order=...)
+        # are stamped on every line
+        with open(path, 'a', encoding='utf-8') as fh:
+            for ev in self.events:
+                fh.write(json.dumps({**extra, **ev}) + "\n")
+            fh.write(json.dumps({**extra, 'span': '__total__', **self.counters}) + "\n")
+
+
+def span(name):
+    rec = getattr(_local, 'recorder', None)
+    return _NULL if rec is None else _Span(rec, name)
+
+
+def count(key, n=1):
+    rec = getattr(_local, 'recorder', None)
+    if rec is not None:
+        rec.count(key, n)
+
+
+def timed_iter(name, iterable, counter=None):
+    # times each next() of a lazy iterable (e.g. pages) as its own span
+    it = iter(iterable)
+    while True:
+        with span(name) as sp:
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            if counter:
+                sp.count(counter)
+        yield item
+
+
+def start():
+    rec = Recorder()
+    _local.recorder = rec
+    return rec
+
+
+def stop():
+    rec = getattr(_local, 'recorder', None)
+    _local.recorder = None
+    return rec
+
+
+class recording:
+    # with perf.recording() as rec: ...  (restores any outer recorder on exit)
+    def __enter__(self):
+        self._prev = getattr(_local, 'recorder', None)
+        return start()
+
+    def __exit__(self, *exc):
+        _local.recorder = self._prev
+        return False
@@ -0,0 +1,323 @@
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import perf
+from comparer import DATE_COLUMNS
+from parser import FRAME_COLUMNS, PARSER_VERSION, TAG_SET_COLUMN, LineItem, is_complete, items_frame, tag_set
+
+# ── Results store ──
+# A SQLite file holding every parsed document and every reconciliation, so
+# results outlive the Streamlit session and past orders can be searched.
+#
+#   documents         one row per (content hash, kind, parser version); OAs
+#                     carry the customer PO number
+#   line_items        the parsed rows, in frame order
+#   item_tags         one row per tag on a line item
+#   reconciliations   one row per PO/OA pair and price tolerance
+#   discrepancies     compare_oa_po's messages, plus the line they name
+#   date_mismatches   compare_oa_po's date table
+#
+# Line numbers are kept as parsed (10 on the PO, "00010" on the OA) for an
+# exact rebuild of the frame, plus as an integer `line_num` that both sides
+# share; lookups by PO number, line, model and tag are all indexed.
+# A document already in the store is loaded instead of re-parsed, as long as
+# the parser version matches.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id              INTEGER PRIMARY KEY,
+    sha256          TEXT NOT NULL,
+    kind            TEXT NOT NULL,
+    parser_version  TEXT NOT NULL,
+    cust_po         TEXT,
+    order_total     TEXT,
+    attrs           TEXT NOT NULL,
+    n_items         INTEGER NOT NULL,
+    stored_at       REAL NOT NULL,
+    UNIQUE (sha256, kind, parser_version)
+);
+CREATE INDEX IF NOT EXISTS documents_cust_po ON documents (cust_po);
+
+CREATE TABLE IF NOT EXISTS line_items (
+    doc_id          INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    pos             INTEGER NOT NULL,
+    line_no,
+    line_num        INTEGER,
+    model           TEXT,
+    ship_date       TEXT,
+    qty             TEXT,
+    unit_price      TEXT,
+    total_price     TEXT,
+    has_tag         TEXT,
+    tags            TEXT,
+    wire_on_tag     TEXT,
+    calib_data      TEXT,
+    calib_details   TEXT,
+    unit_cents      INTEGER,
+    total_cents     INTEGER,
+    PRIMARY KEY (doc_id, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS line_items_line_num ON line_items (line_num);
+CREATE INDEX IF NOT EXISTS line_items_model ON line_items (model);
+
+CREATE TABLE IF NOT EXISTS item_tags (
+    doc_id          INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    pos             INTEGER NOT NULL,
+    tag             TEXT NOT NULL,
+    PRIMARY KEY (doc_id, pos, tag)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS item_tags_tag ON item_tags (tag);
+
+CREATE TABLE IF NOT EXISTS reconciliations (
+    id                  INTEGER PRIMARY KEY,
+    cust_po             TEXT,
+    po_doc              INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    oa_doc              INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    price_tolerance     REAL NOT NULL,
+    n_discrepancies     INTEGER NOT NULL,
+    n_date_mismatches   INTEGER NOT NULL,
+    created_at          REAL NOT NULL,
+    UNIQUE (po_doc, oa_doc, price_tolerance)
+);
+CREATE INDEX IF NOT EXISTS reconciliations_cust_po ON reconciliations (cust_po);
+
+CREATE TABLE IF NOT EXISTS discrepancies (
+    recon_id        INTEGER NOT NULL REFERENCES reconciliations (id) ON DELETE CASCADE,
+    pos             INTEGER NOT NULL,
+    line_num        INTEGER,
+    message         TEXT NOT NULL,
+    PRIMARY KEY (recon_id, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS discrepancies_line_num ON discrepancies (line_num);
+
+CREATE TABLE IF NOT EXISTS date_mismatches (
+    recon_id        INTEGER NOT NULL REFERENCES reconciliations (id) ON DELETE CASCADE,
+    pos             INTEGER NOT NULL,
+    line            TEXT,
+    line_num        INTEGER,
+    oa_dates        TEXT,
+    po_dates        TEXT,
+    difference      TEXT,
+    PRIMARY KEY (recon_id, pos)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS date_mismatches_line_num ON date_mismatches (line_num);
+"""
+
+# line_items columns in LineItem field order, minus the tag set (item_tags)
+_ITEM_COLUMNS = ['line_no', 'model', 'ship_date', 'qty', 'unit_price', 'total_price', 'has_tag',
+                 'tags', 'wire_on_tag', 'calib_data', 'calib_details', 'unit_cents', 'total_cents']
+
+RE_MESSAGE_LINE = re.compile(r'Line (\d+):')
+
+
+def line_num(line_no):
+    # 10 and "00010" both -> 10; tariff rows and the like -> None
+    if isinstance(line_no, int):
+        return line_no
+    line_no = str(line_no).strip()
+    return int(line_no) if line_no.isdigit() else None
+
+
+def _cell(v):
+    # numpy / pandas scalars -> plain Python for sqlite3
+    if v is None or v is pd.NA:
+        return None
+    return v.item() if hasattr(v, 'item') else v
+
+
+class ResultsStore:
+    def __init__(self, path):
+        self.path  = path
+        self._lock = threading.Lock()  # one connection, shared by the app's threads
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # batch workers write side by side
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    # documents
+
+    def _doc_id(self, sha256, kind):
+        row = self._conn.execute(
+            "SELECT id FROM documents WHERE sha256 = ? AND kind = ? AND parser_version = ?",
+            (sha256, kind, PARSER_VERSION)).fetchone()
+        return row[0] if row else None
+
+    def load_document(self, sha256, kind):
+        # the parsed frame, rebuilt exactly as the parser returned it, or None
+        with perf.span('store.load'), self._lock:
+            row = self._conn.execute(
+                "SELECT id, attrs FROM documents WHERE sha256 = ? AND kind = ? AND parser_version = ?",
+                (sha256, kind, PARSER_VERSION)).fetchone()
+            if row is None:
+                return None
+            doc_id, attrs = row
+            items = self._conn.execute(
+                f"SELECT pos, {', '.join(_ITEM_COLUMNS)} FROM line_items WHERE doc_id = ? ORDER BY pos",
+                (doc_id,)).fetchall()
+            tags = {}
+            for pos, tag in self._conn.execute("SELECT pos, tag FROM item_tags WHERE doc_id = ?", (doc_id,)):
+                tags.setdefault(pos, []).append(tag)
+        records = [LineItem(*r[1:], tag_set=tag_set(tags.get(r[0], ()))) for r in items]
+        return items_frame(records, **json.loads(attrs))
+
+    def save_document(self, sha256, kind, df):
+        if df.attrs.get('skipped'):
+            raise ValueError("only full parses are stored; this one skipped " + ", ".join(df.attrs['skipped']))
+        if df.attrs.get('page_failures'):
+            raise ValueError(f"only full parses are stored; {len(df.attrs['page_failures'])} page(s) of this one failed")
+        with perf.span('store.save'), self._lock, self._conn:
+            doc_id = self._doc_id(sha256, kind)
+            if doc_id is not None:
+                return doc_id
+            cur = self._conn.execute(
+                "INSERT INTO documents (sha256, kind, parser_version, cust_po, order_total, attrs, n_items, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (sha256, kind, PARSER_VERSION, df.attrs.get('cust_po') or None,
+                 df.attrs.get('order_total') or None, json.dumps(df.attrs), len(df), time.time()))
+            doc_id = cur.lastrowid
+            cols = [df[c].tolist() for c in FRAME_COLUMNS[:len(_ITEM_COLUMNS)]]
+            self._conn.executemany(
+                f"INSERT INTO line_items (doc_id, pos, line_num, {', '.join(_ITEM_COLUMNS)}) "
+                f"VALUES (?, ?, ?, {', '.join('?' * len(_ITEM_COLUMNS))})",
+                ((doc_id, pos, line_num(row[0]), *map(_cell, row)) for pos, row in enumerate(zip(*cols))))
+            self._conn.executemany(
+                "INSERT INTO item_tags (doc_id, pos, tag) VALUES (?, ?, ?)",
+                ((doc_id, pos, tag) for pos, tags in enumerate(df[TAG_SET_COLUMN]) for tag in tags))
+            return doc_id
+
+    def get_or_parse(self, kind, source, parse_fn):
+        # source is an ingest.PdfSource; its hash keys the document
+        df = self.load_document(source.sha256(), kind)
+        if df is None:
+            perf.count('store_misses')
+            df = parse_fn(source)
+            if is_complete(df):
+                self.save_document(source.sha256(), kind, df)
+        else:
+            perf.count('store_hits')
+        return df
+
+    # reconciliations
+
+    def _recon_id(self, po_sha, oa_sha, price_tolerance):
+        row = self._conn.execute(
+            "SELECT r.id FROM reconciliations r "
+            "JOIN documents p ON p.id = r.po_doc JOIN documents o ON o.id = r.oa_doc "
+            "WHERE p.sha256 = ? AND o.sha256 = ? AND p.parser_version = ? AND o.parser_version = ? "
+            "AND r.price_tolerance = ?",
+            (po_sha, oa_sha, PARSER_VERSION, PARSER_VERSION, float(price_tolerance))).fetchone()
+        return row[0] if row else None
+
+    def load_reconciliation(self, po_sha, oa_sha, price_tolerance):
+        # (disc_df, date_df) from an earlier run on the same pair, or None
+        with perf.span('store.load'), self._lock:
+            recon_id = self._recon_id(po_sha, oa_sha, price_tolerance)
+            if recon_id is None:
+                return None
+            msgs = self._conn.execute(
+                "SELECT message FROM discrepancies WHERE recon_id = ? ORDER BY pos", (recon_id,)).fetchall()
+            dates = self._conn.execute(
+                "SELECT line, oa_dates, po_dates, difference FROM date_mismatches WHERE recon_id = ? ORDER BY pos",
+                (recon_id,)).fetchall()
+        disc_df = pd.DataFrame([{'Discrepancy': m} for (m,) in msgs])
+        return disc_df, pd.DataFrame(dates, columns=DATE_COLUMNS)
+
+    def save_reconciliation(self, po_sha, oa_sha, disc_df, date_df, price_tolerance, cust_po=None):
+        # both documents must already be saved
+        with perf.span('store.save'), self._lock, self._conn:
+            po_doc, oa_doc = self._doc_id(po_sha, 'po'), self._doc_id(oa_sha, 'oa')
+            if po_doc is None or oa_doc is None:
+                raise KeyError("save both documents before their reconciliation")
+            if cust_po is None:
+                row = self._conn.execute("SELECT cust_po FROM documents WHERE id = ?", (oa_doc,)).fetchone()
+                cust_po = row[0]
+            self._conn.execute(
+                "DELETE FROM reconciliations WHERE po_doc = ? AND oa_doc = ? AND price_tolerance = ?",
+                (po_doc, oa_doc, float(price_tolerance)))
+            cur = self._conn.execute(
+                "INSERT INTO reconciliations (cust_po, po_doc, oa_doc, price_tolerance, "
+                "n_discrepancies, n_date_mismatches, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cust_po or None, po_doc, oa_doc, float(price_tolerance), len(disc_df), len(date_df), time.time()))
+            recon_id = cur.lastrowid
+            msgs = disc_df['Discrepancy'].tolist() if not disc_df.empty else []
+            self._conn.executemany(
+                "INSERT INTO discrepancies (recon_id, pos, line_num, message) VALUES (?, ?, ?, ?)",
+                ((recon_id, pos, _message_line(m), m) for pos, m in enumerate(msgs)))
+            rows = date_df[DATE_COLUMNS].itertuples(index=False) if not date_df.empty else ()
+            self._conn.executemany(
+                "INSERT INTO date_mismatches (recon_id, pos, line, line_num, oa_dates, po_dates, difference) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                ((recon_id, pos, _cell(r[0]), line_num(r[0]), *map(_cell, r[1:])) for pos, r in enumerate(rows)))
+            return recon_id
+
+    # lookups
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=params)
+
+    def reconciliations(self, cust_po=None):
+        where, params = ("WHERE r.cust_po = ?", (cust_po,)) if cust_po else ("", ())
+        return self._query(
+            "SELECT r.id, r.cust_po, datetime(r.created_at, 'unixepoch') AS created, r.price_tolerance, "
+            "r.n_discrepancies, r.n_date_mismatches, p.sha256 AS po_sha256, o.sha256 AS oa_sha256 "
+            "FROM reconciliations r JOIN documents p ON p.id = r.po_doc JOIN documents o ON o.id = r.oa_doc "
+            f"{where} ORDER BY r.created_at DESC", params)
+
+    def find_lines(self, cust_po=None, line=None, model=None, tag=None):
+        # stored line items matching every filter given; cust_po matches the
+        # OA's own lines and the lines of POs reconciled against it
+        clauses, params = [], []
+        if cust_po:
+            clauses.append("li.doc_id IN (SELECT id FROM documents WHERE cust_po = ? "
+                           "UNION SELECT po_doc FROM reconciliations WHERE cust_po = ?)")
+            params += [cust_po, cust_po]
+        if line is not None:
+            clauses.append("li.line_num = ?")
+            params.append(line_num(line))
+        if model:
+            clauses.append("li.model = ?")
+            params.append(model)
+        if tag:
+            clauses.append("EXISTS (SELECT 1 FROM item_tags t WHERE t.tag = ? AND t.doc_id = li.doc_id AND t.pos = li.pos)")
+            params.append(tag)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            "SELECT d.kind, d.cust_po, d.sha256, li.line_no, li.model, li.ship_date, li.qty, "
+            "li.unit_price, li.total_price, li.tags, li.calib_details "
+            f"FROM line_items li JOIN documents d ON d.id = li.doc_id {where} "
+            "ORDER BY d.stored_at DESC, li.pos", params)
+
+    def find_discrepancies(self, cust_po=None, line=None):
+        clauses, params = [], []
+        if cust_po:
+            clauses.append("r.cust_po = ?")
+            params.append(cust_po)
+        if line is not None:
+            clauses.append("x.line_num = ?")
+            params.append(line_num(line))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._query(
+            "SELECT r.cust_po, datetime(r.created_at, 'unixepoch') AS created, x.line_num AS line, x.message "
+            f"FROM discrepancies x JOIN reconciliations r ON r.id = x.recon_id {where} "
+            "ORDER BY r.created_at DESC, x.pos", params)
+
+
+def _message_line(msg):
+    m = RE_MESSAGE_LINE.match(msg)
+    return int(m.group(1)) if m else None
@@ -0,0 +1,211 @@
+import random
+
+# ── Synthetic OA/PO documents ──
+# Text laid out the way pdfplumber hands it to parse_po_text / parse_oa_text,
+# plus a bare-bones PDF writer so the extraction stage can be exercised too.
+#
+# Orders cover: OA blocks shared by several line numbers (00010/00020),
+# TARIFF rows, NAME / WIRE / PERM tag labels, slash-combined tags, calibration
+# ranges with units (on the same or the next line) and OA wire codes, and
+# ORDER TOTAL footers. Both parsers drop line numbers above 10000, so orders
+# longer than that repeat line numbers the way split schedule lines do.
+
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+          'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+MAX_LINE_NO = 10000
+
+CALIB_UNITS = [('DEG C', True), ('DEG F', True), ('KPA', False), ('PSI', False)]
+
+
+def make_order(n_lines, seed=0):
+    rng = random.Random(seed)
+    lines = []
+    step  = 10 if n_lines * 10 <= MAX_LINE_NO else 1
+    for k in range(1, n_lines + 1):
+        ln = ((k - 1) * step) % MAX_LINE_NO + step
+        if lines and rng.random() < 0.05:
+            # same configuration under the next line number; the OA prints
+            # these as one block headed "00010/00020"
+            lines.append(dict(lines[-1], ln=ln))
+            continue
+        qty = rng.randint(1, 4)
+        if rng.random() < 0.4:
+            tags, style = [], None
+        elif qty > 1:
+            tags, style = [f"TT-{k:05d}{chr(65 + i)}" for i in range(qty)], 'wire'
+        else:
+            style = rng.choice(['name', 'perm', 'wire', 'slash'])
+            tags  = [f"IC-{k:05d}A/IC-{k:05d}B"] if style == 'slash' else [f"TT-{k:05d}A"]
+        calib = None
+        if rng.random() < 0.5:
+            unit, rtd = rng.choice(CALIB_UNITS)
+            calib = {
+                'lo':        rng.choice([-50, 0, 10]),
+                'hi':        rng.choice([100, 200, 400]),
+                'unit':      unit,
+                'wire':      rng.choice([3, 4]) if rtd else None,
+                'same_line': rng.random() < 0.5,
+            }
+        lines.append({
+            'ln':        ln,
+            'model':     f"{rng.choice(['3051', '644', '3144P', 'TT'])}{rng.choice('ACHT')}"
+                         f"{rng.randint(10, 99)}A{rng.randint(100, 999)}B{rng.randint(1, 9)}",
+            'day':       rng.randint(1, 28),
+            'month':     rng.randrange(12),
+            'year':      rng.choice([2024, 2025]),
+            'oa_date':   'expected' if rng.random() < 0.9 else 'plain',
+            'qty':       qty,
+            'unit':      rng.randint(100, 9999) + rng.choice([0, 0.5, 0.25]),
+            'tags':      tags,
+            'tag_style': style,
+            'calib':     calib,
+        })
+    return lines
+
+
+def perturb_order(order, rate=0.05, seed=1):
+    # copy of the order with roughly `rate` of its lines changed or dropped,
+    # the way a vendor's acknowledgement drifts from the PO
+    rng = random.Random(seed)
+    out = []
+    for it in order:
+        it = dict(it)
+        r  = rng.random()
+        if r < rate / 5:
+            continue
+        elif r < 2 * rate / 5:
+            it['model'] = it['model'][:-1] + 'X'
+        elif r < 3 * rate / 5:
+            it['unit'] += 1
+        elif r < 4 * rate / 5:
+            it['day'] = it['day'] % 28 + 1
+        elif r < rate:
+            it['tags'] = it['tags'][:-1] + ['TT-99999Z']
+            it['tag_style'] = 'wire' if len(it['tags']) > 1 else 'name'
+        out.append(it)
+    return out
+
+
+def tariffs_for(order):
+    # one surcharge per 200 lines, at least one
+    return [150.0 * (i + 1) for i in range(max(1, len(order) // 200))]
+
+
+def _money(v):
+    return f"{v:,.2f}"
+
+
+def make_po_text(order):
+    out = ["SPARTAN CONTROLS LTD.", "PURCHASE ORDER 4500012345", "Line Item Description Date Qty Unit Total"]
+    total = 0.0
+    for it in order:
+        line_total = it['qty'] * it['unit']
+        total += line_total
+        out.append(f"{it['ln']:05d} {it['model']} {MONTHS[it['month']]} {it['day']}, {it['year']} "
+                   f"{it['qty']} EA {_money(it['unit'])} {_money(line_total)}")
+        out.append("Transmitter, pressure, 316 SST")
+        cal = it['calib']
+        if cal:
+            out.append("Additional Information")
+            if cal['same_line']:
+                out.append(f"Calibration {cal['lo']} to {cal['hi']} {cal['unit']}")
+            else:
+                out.append(f"Calibration range {cal['lo']} to {cal['hi']}")
+                out.append(cal['unit'])
+            if cal['wire']:
+                out.append(f"{cal['wire']}-wire RTD")
+        if it['tags']:
+            out.append("Tags")
+            if it['tag_style'] == 'slash':
+                out.append(it['tags'][0].replace('/', ' / '))
+            else:
+                out.append(", ".join(it['tags']))
+        out.append("Sold To: Spartan Controls")
+    out.append(f"Order total USD ${_money(total)}")
+    out.append("SPARTAN CONTROLS LTD. GST# 123456789")
+    out.append("Terms and conditions apply.")
+    return "\n".join(out)
+
+
+def _oa_block(it, line_nos):
+    line_total = it['qty'] * it['unit']
+    out = [f"{'/'.join(f'{ln:05d}' for ln in line_nos)} {it['model']} "
+           f"{it['qty']} {_money(it['unit'])} {_money(line_total)}"]
+    if it['oa_date'] == 'expected':
+        out.append(f"Expected Ship Date: {it['day']:02d}-{MONTHS[it['month']]}-{it['year']}")
+    else:
+        out.append(f"Ship {MONTHS[it['month']]} {it['day']:02d}, {it['year']}")
+    style = it['tag_style']
+    if it['tags'] and style == 'wire':
+        # a non-tag line after the label sends the parser to the
+        # "every tag below WIRE:" fallback
+        out.extend(["WIRE:", "Stainless steel wire-on tags"] + it['tags'])
+    elif it['tags'] and style == 'slash':
+        out.extend(["NAME:", it['tags'][0].replace('/', ' / ')])
+    elif it['tags']:
+        out.extend([f"{style.upper()}:", it['tags'][0]])
+    cal = it['calib']
+    if cal:
+        out.append(f"{cal['lo']} to {cal['hi']}")
+        out.append(cal['unit'])
+        if cal['wire']:
+            out.append(f"1{cal['wire']}")
+    return out
+
+
+def make_oa_text(order):
+    out = ["ORDER ACKNOWLEDGEMENT", "Customer PO No: 4500012345", "Line Item Qty Unit Total"]
+    total = 0.0
+    i = 0
+    while i < len(order):
+        it = order[i]
+        j  = i + 1
+        while j < len(order) and {**order[j], 'ln': it['ln']} == it:
+            j += 1
+        out.extend(_oa_block(it, [o['ln'] for o in order[i:j]]))
+        total += (j - i) * it['qty'] * it['unit']
+        i = j
+    for n, amount in enumerate(tariffs_for(order), 1):
+        out.append(f"{n}0.1 TARIFF-SURCHARGE 1 {_money(amount)} {_money(amount)}")
+        total += amount
+    out.append(f"Total (USD) {_money(total)}")
+    return "\n".join(out)
+
+
+# ── Minimal PDF writer ──
+# One Helvetica text line per row, 60 rows per letter page. pdfminer knows the
+# standard-14 font metrics, so no font program or width table is embedded.
+
+def _pdf_escape(s):
+    return s.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def text_to_pdf(text, lines_per_page=60):
+    rows  = text.split('\n')
+    pages = [rows[i:i + lines_per_page] for i in range(0, len(rows), lines_per_page)] or [[]]
+
+    objs = [b"<< /Type /Catalog /Pages 2 0 R >>",
+            None,  # page tree, filled in once the kids are known
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in pages:
+        stream = "BT /F1 9 Tf 11 TL 36 767 Td\n" + "".join(f"({_pdf_escape(r)}) '\n" for r in page) + "ET"
+        stream = stream.encode('latin-1', 'replace')
+        objs.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        kids.append(len(objs) + 1)
+        objs.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objs)))
+    objs[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids))
+
+    out     = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (num, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objs) + 1)
+    out += b"".join(b"%010d 00000 n \n" % off for off in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n" % (len(objs) + 1, xref)
+    return bytes(out)
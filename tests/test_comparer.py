@@ -0,0 +1,27 @@
+import pandas as pd
+
+import comparer as C
+
+
+def _tags(lines):
+    # a frame of line numbers and their tag sets, all moved_tags reads
+    return pd.DataFrame({'Line No': list(lines), 'Tag Set': [frozenset(t) for t in lines.values()]})
+
+
+def test_missing_line_is_not_a_move():
+    po = _tags({'270': {'TT-00027A'}, '280': {'TT-00027A', 'TT-00028A'}})
+    oa = _tags({'280': {'TT-00027A', 'TT-00028A'}})
+    assert C.moved_tags(po, oa) == []
+
+
+def test_gained_tag_is_not_a_move():
+    po = _tags({'10': {'TT-1'}, '20': set()})
+    oa = _tags({'10': {'TT-1'}, '20': {'TT-1'}})
+    assert C.moved_tags(po, oa) == []
+
+
+def test_moved_tag():
+    po = _tags({'10': {'TT-1'}, '20': {'TT-2'}, '30': set()})
+    oa = _tags({'10': set(), '20': {'TT-2'}, '30': {'TT-1'}})
+    assert C.moved_tags(po, oa) == ["Tag TT-1 moved → OA line(s): 30 vs PO line(s): 10"]
+    assert C.moved_tags_between(C.tag_index(po), C.tag_index(oa), {'10', '20', '30'}) == C.moved_tags(po, oa)
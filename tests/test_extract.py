@@ -0,0 +1,42 @@
+import os
+import signal
+import time
+
+import pytest
+
+import extract
+from ingest import PdfSource
+from synthetic import make_oa_text, make_order, text_to_pdf
+
+
+@pytest.fixture(scope='module')
+def pdf():
+    return text_to_pdf(make_oa_text(make_order(60)))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sandbox_matches_inline(pdf, workers):
+    stats = {}
+    pages = list(extract.iter_pages_sandboxed(pdf, stats, workers=workers))
+    assert pages == list(extract.iter_pages(pdf, workers=1, sandbox=False))
+    assert stats['pages_total'] == len(pages) and stats['page_failures'] == []
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_sandbox_open_timeout(pdf, workers, monkeypatch):
+    # the children fork from here, so they inherit the slow open
+    real_open = PdfSource.open
+    monkeypatch.setattr(PdfSource, 'open', lambda self: time.sleep(5) or real_open(self))
+    with pytest.raises(RuntimeError, match='could not open the PDF: timed out'):
+        list(extract.iter_pages_sandboxed(pdf, page_timeout=0.5, workers=workers))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+@pytest.mark.parametrize('opening, reason', [
+    (lambda: bytearray(512 * 2**20), 'out of memory'),     # caught in the child
+    (lambda: os.kill(os.getpid(), signal.SIGKILL), 'extraction crashed'),  # as the cap usually ends
+])
+def test_sandbox_open_failure(pdf, workers, opening, reason, monkeypatch):
+    monkeypatch.setattr(PdfSource, 'open', lambda self: opening())
+    with pytest.raises(RuntimeError, match=f'could not open the PDF: {reason}'):
+        list(extract.iter_pages_sandboxed(pdf, memory_mb=64, workers=workers))
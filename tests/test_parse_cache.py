@@ -0,0 +1,41 @@
+import pandas as pd
+
+from parse_cache import ParseCache
+
+
+def _parser(failures):
+    calls = []
+
+    def parse(source):
+        calls.append(source)
+        df = pd.DataFrame({'Line No': ['10']})
+        if failures:
+            df.attrs['page_failures'] = [(2, 'timed out after 30s')]
+        return df
+    return parse, calls
+
+
+def test_complete_parse_is_kept(tmp_path):
+    cache = ParseCache(disk_dir=str(tmp_path), partial_ttl=0)
+    parse, calls = _parser(failures=False)
+    cache.get_or_parse('oa', b'%PDF one', parse)
+    cache.get_or_parse('oa', b'%PDF one', parse)
+    assert len(calls) == 1 and len(list(tmp_path.iterdir())) == 1
+
+
+def test_partial_parse_expires(tmp_path):
+    cache = ParseCache(disk_dir=str(tmp_path), partial_ttl=60)
+    parse, calls = _parser(failures=True)
+    cache.get_or_parse('oa', b'%PDF one', parse)
+    cache.get_or_parse('oa', b'%PDF one', parse)
+    assert len(calls) == 1 and list(tmp_path.iterdir()) == []
+    cache.partial_ttl = 0
+    cache.get_or_parse('oa', b'%PDF two', parse)
+    cache.get_or_parse('oa', b'%PDF two', parse)
+    assert len(calls) == 3
+
+
+def test_hit_returns_the_cached_frame():
+    cache = ParseCache()
+    parse, _ = _parser(failures=False)
+    assert cache.get_or_parse('po', b'%PDF one', parse) is cache.get_or_parse('po', b'%PDF one', parse)
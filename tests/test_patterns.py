@@ -0,0 +1,110 @@
+import random
+import re
+
+import pytest
+
+import benchmark
+import parser as P
+
+# ── Pattern hardening ──
+# The parser's patterns were rewritten (lookbehinds, possessive quantifiers,
+# atomic groups, one attempt per run or slash) so OCR-noise lines can't make
+# them backtrack. Each rewrite must find exactly what the original did, the
+# way the parser applies it; they're compared on seeded random text built
+# from the characters and literals the patterns care about. The last test
+# runs the `benchmark.py backtrack` budget.
+
+ORIGINAL = {
+    'RE_PO_ORDER_TOTAL':  re.compile(r'Order total.*?\$?USD.*?([\d,]+\.\d{2})', re.IGNORECASE),
+    'RE_PO_QTY_PRICE':    re.compile(r'(\d+)\s+EA\s+([\d,]+\.\d{2})\s+([\d,]+\.\d{2})'),
+    'RE_SLASH_TAG':       re.compile(r'\b[A-Z0-9\-_]+\s*/\s*[A-Z0-9\-]+(?:-NC)?\b', re.IGNORECASE),
+    'RE_SLASH_SPACING':   re.compile(r'\s*/\s*'),
+    'RE_PO_CALIB_RANGE':  re.compile(r'(-?\d+(?:\.\d+)?)\s*to\s*(-?\d+(?:\.\d+)?)(?:\s*([A-Za-z°\sCFK%/]+))?'),
+    'RE_OA_ORDER_TOTAL':  re.compile(r'Total.*?\(USD\).*?([\d,]+\.\d{2})', re.IGNORECASE),
+    'RE_OA_MODEL':        re.compile(r'\b(?=[A-Z0-9\-_]*[A-Z])[A-Z0-9\-_]{6,}\b'),
+    'RE_OA_TAG_LABEL':    re.compile(r'^(NAME|WIRE|PERM)\s*[:\s]*$'),
+    'RE_OA_CALIB_RANGE':  re.compile(r'-?\d+(?:\.\d+)?\s*to\s*-?\d+(?:\.\d+)?'),
+}
+
+PIECES = list("AB1209-_/ \n,.$:#toTOxaé\t") + [
+    'Order total', 'USD', '(USD)', 'Total', 'Subtotal', 'SPARTAN', 'GST#', ' to ', 'EA', '-NC', ' / ',
+    '12.50', '1,234.56', '5-10', 'NAME', 'WIRE', 'degC', '°C', 'ABCDEF', '123456', 'ſ']
+
+
+def _texts(seed, count=20000, longest=40):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield ''.join(rng.choice(PIECES) for _ in range(rng.randint(0, longest)))
+
+
+def _spans(found):
+    # comparable form of a match, a match list or plain strings
+    if found is None or isinstance(found, (str, bool)):
+        return found
+    if isinstance(found, re.Match):
+        return found.span(), found.groups()
+    return [_spans(f) for f in found]
+
+
+def _compound(pattern, text):
+    # the OA tag step: respace a candidate, keep it only as a whole compound tag
+    compound = pattern.sub('/', text.upper())
+    return compound if P.RE_OA_COMPOUND_TAG.fullmatch(compound) else None
+
+
+# name → (original application, current application), as the parser uses them
+APPLY = {
+    'RE_PO_ORDER_TOTAL': (
+        lambda t: P._line_search(ORIGINAL['RE_PO_ORDER_TOTAL'], t, P._lowered(t), 'order total'),
+        lambda t: P._line_search(P.RE_PO_ORDER_TOTAL, t, P._lowered(t), 'order total', anchored=True)),
+    'RE_PO_GST': (
+        lambda t: P._line_search(P.RE_PO_GST, t, P._lowered(t), 'gst#'),
+        lambda t: P._line_search(P.RE_PO_GST, t, P._lowered(t), 'spartan', anchored=True)),
+    'RE_OA_ORDER_TOTAL': (
+        lambda t: P._line_search(ORIGINAL['RE_OA_ORDER_TOTAL'], t, P._lowered(t), 'total'),
+        lambda t: P._line_search(P.RE_OA_ORDER_TOTAL, t, P._lowered(t), 'total', anchored=True)),
+    'RE_PO_QTY_PRICE': (
+        lambda t: ORIGINAL['RE_PO_QTY_PRICE'].search(t),
+        lambda t: P.RE_PO_QTY_PRICE.search(t)),
+    'RE_SLASH_TAG': (
+        lambda t: ORIGINAL['RE_SLASH_TAG'].findall(t),
+        P._slash_tags),
+    'RE_SLASH_SPACING': (
+        lambda t: [ORIGINAL['RE_SLASH_SPACING'].sub('/', r.upper()) for r in ORIGINAL['RE_SLASH_TAG'].findall(t)]
+                  + [_compound(ORIGINAL['RE_SLASH_SPACING'], t)],
+        lambda t: [P.RE_SLASH_SPACING.sub('/', r.upper()) for r in P._slash_tags(t)]
+                  + [_compound(P.RE_SLASH_SPACING, t)]),
+    'RE_PO_CALIB_RANGE': (
+        lambda t: list(ORIGINAL['RE_PO_CALIB_RANGE'].finditer(t)),
+        lambda t: list(P.RE_PO_CALIB_RANGE.finditer(t))),
+    'RE_OA_CALIB_RANGE': (
+        lambda t: ORIGINAL['RE_OA_CALIB_RANGE'].findall(t),
+        lambda t: P.RE_OA_CALIB_RANGE.findall(t)),
+    'RE_OA_MODEL': (
+        lambda t: ORIGINAL['RE_OA_MODEL'].search(t),
+        P._oa_model),
+    'RE_OA_TAG_LABEL': (
+        lambda t: ORIGINAL['RE_OA_TAG_LABEL'].match(t),
+        lambda t: P.RE_OA_TAG_LABEL.match(t)),
+}
+
+
+@pytest.mark.parametrize('name', sorted(APPLY))
+def test_hardened_pattern_matches_original(name):
+    original, current = APPLY[name]
+    for text in _texts(seed=name):
+        assert _spans(current(text)) == _spans(original(text)), text
+
+
+@pytest.mark.parametrize('text, model', [
+    ('ABCDEF- x', 'ABCDEF'),                  # the token backs off to the boundary before '-'
+    ('123456-Ab', '123456-'),                 # the letter may sit past the token
+    ('xAB-12345C', '-12345C'),                # glued to a lowercase word: first boundary is inside
+    ('1-' * 500 + ' MODEL-1', 'MODEL-1'),     # a letterless run before the model
+])
+def test_oa_model_examples(text, model):
+    assert P._oa_model(text).group(0) == ORIGINAL['RE_OA_MODEL'].search(text).group(0) == model
+
+
+def test_backtracking_budget():
+    assert benchmark.bench_backtrack([2000, 8000, 32000], budget_ms=50.0, max_growth=8.0) == 0